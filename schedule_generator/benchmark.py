@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import datetime
+import io
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import timeit
+
+from generator import DIVISIONS, Schedule
+from validator import validate_schedule
+
+SAMPLE_CSVS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sample_csvs')
+
+# Exit codes for the command line
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+
+# Default for how much slower (as a ratio) a result can be than the baseline before it counts as a regression
+DEFAULT_REGRESSION_THRESHOLD = 1.2
+
+# Shape of a regular season (5 courts, 5 time slots, 10 weeks), which the synthetic seasons are scaled up from
+BASE_SHAPE = {'courts': 5, 'slots': 5, 'weeks': 10, 'teams_per_division': 12}
+SYNTHETIC_AXES = ['courts', 'slots', 'weeks', 'teams']
+
+
+def make_synthetic_csv(courts, slots, weeks, teams_per_division, seed=0):
+    # Writes a made up season in the same layout as the csv downloaded from the sheet. Each court is given
+    # to a division in turn and every game (and its ref) comes from that division, like the real schedules
+    rng = random.Random(seed)
+    # Every court in a time slot needs 3 different teams from its division
+    teams_per_division = max(teams_per_division, 3 * math.ceil(courts / len(DIVISIONS)))
+    divisions = {division: [division + str(i) for i in range(1, teams_per_division + 1)] for division in DIVISIONS}
+    num_cols = 2 + 3 * courts + 3
+    bye_header_col = 2 + 3 * courts + 1
+    start_time = datetime.datetime(2025, 1, 1, 15, 30)
+    # Time slots are a minute apart so there can be as many as needed without repeating
+    time_slots = [(start_time + datetime.timedelta(minutes=i)).strftime('%I:%M %p').lstrip('0') for i in range(slots)]
+
+    def make_row(cells):
+        row = [''] * num_cols
+        for col_num, value in cells.items():
+            row[col_num] = value
+        return row
+
+    rows = [make_row({}),
+            make_row({2: 'SCVL SPRING 2025 SEASON SCHEDULE'}),
+            make_row({2 + 3 * i: 'Court ' + str(i + 1) for i in range(courts)})]
+    first_week = datetime.date(2025, 1, 5)
+    for week_num in range(weeks):
+        week_date = first_week + datetime.timedelta(weeks=week_num)
+        rows.append(make_row({3: 'Week ' + str(week_num + 1) + ': ' + week_date.strftime('%b %d').replace(' 0', ' '),
+                              bye_header_col: 'BYE'}))
+        queues = {division: rng.sample(teams, len(teams)) for division, teams in divisions.items()}
+        used = set()
+        slot_rows = []
+        for time_slot in time_slots:
+            cells = {1: time_slot}
+            slot_teams = set()
+            for court_num in range(courts):
+                division = DIVISIONS[court_num % len(DIVISIONS)]
+                queue = queues[division]
+                # Take the next 3 teams that aren't already on a court in this time slot
+                picked = []
+                while len(picked) < 3:
+                    team = queue.pop(0)
+                    queue.append(team)
+                    if team not in slot_teams:
+                        picked.append(team)
+                        slot_teams.add(team)
+                cells[3 + 3 * court_num] = picked[0] + ' v ' + picked[1]
+                cells[4 + 3 * court_num] = 'ref: ' + picked[2]
+            used |= slot_teams
+            slot_rows.append(cells)
+        # Teams that never made it onto a court this week have a bye, spread over the rows of the week
+        byes = [team for teams in divisions.values() for team in teams if team not in used]
+        for row_num, cells in enumerate(slot_rows):
+            row_byes = byes[row_num::len(slot_rows)]
+            if row_byes:
+                cells[bye_header_col + 1] = ' '.join(row_byes)
+            rows.append(make_row(cells))
+        rows.append(make_row({}))
+
+    csv_file = io.StringIO()
+    csv.writer(csv_file, lineterminator='\n').writerows(rows)
+    return csv_file.getvalue()
+
+
+def get_cases(scales, axes, include_samples=True):
+    # (case name, csv text) for every sample season and every synthetic season
+    cases = []
+    if include_samples:
+        for csv_filename in sorted(os.listdir(SAMPLE_CSVS_DIR)):
+            if csv_filename.lower().endswith('.csv'):
+                with open(os.path.join(SAMPLE_CSVS_DIR, csv_filename), newline='') as csvfile:
+                    cases.append(('sample/' + csv_filename[:-len('.csv')], csvfile.read()))
+    for scale in scales:
+        for axis in axes:
+            shape = dict(BASE_SHAPE)
+            shape['teams_per_division' if axis == 'teams' else axis] *= scale
+            cases.append(('synthetic/' + axis + 'x' + str(scale), make_synthetic_csv(**shape)))
+    return cases
+
+
+def parse_csv_text(csv_text):
+    sked = Schedule()
+    sked.parse_rows(csv.reader(io.StringIO(csv_text, newline=''), delimiter=',', quotechar='"'))
+    return sked
+
+
+def render_team_pages(sked):
+    week_dates = sked.get_week_dates()
+    for team_name, team_schedule in sked.get_team_schedules().items():
+        sked.render_team_page(team_name, team_schedule, '', '')
+        sked.render_team_calendar(team_name, team_schedule, week_dates)
+
+
+def count_games(sked):
+    return sum(len(week_sked.time_slots) * len(sked.court_titles) for week_sked in sked.weekly_skeds.values())
+
+
+def time_phase(func, repeat):
+    # Same approach as timeit: garbage collection is turned off while timing and the best run is the most
+    # reliable number (the others are slowed down by whatever else the machine was doing)
+    times = timeit.repeat(func, number=1, repeat=repeat)
+    return min(times), statistics.median(times)
+
+
+def benchmark_case(name, csv_text, repeat):
+    sked = parse_csv_text(csv_text)
+    games = count_games(sked)
+    phases = {
+        'parse': lambda: parse_csv_text(csv_text),
+        'render': lambda: sked.generate_html(io.StringIO()),
+        'render_compact': lambda: sked.generate_compact_html(io.StringIO()),
+        'validate': lambda: validate_schedule(sked),
+        'team_pages': lambda: render_team_pages(sked),
+    }
+    results = []
+    for phase, func in phases.items():
+        best, median = time_phase(func, repeat)
+        results.append({
+            'case': name,
+            'phase': phase,
+            'games': games,
+            'best': best,
+            'median': median,
+            # Time per game makes anything that grows worse than linear stand out as the seasons get bigger
+            'us_per_game': best / max(games, 1) * 1e6,
+        })
+    return results
+
+
+def load_results(filename):
+    # Results files are json lines with a header line, keyed here on (case, phase)
+    results = {}
+    with open(filename, 'r') as results_file:
+        for line in results_file:
+            record = json.loads(line)
+            if 'phase' in record:
+                results[(record['case'], record['phase'])] = record
+    return results
+
+
+def save_results(filename, results):
+    header = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+    }
+    with open(filename, 'w') as results_file:
+        for record in [header] + results:
+            results_file.write(json.dumps(record) + '\n')
+
+
+def print_results(results, baseline, threshold):
+    # Prints the results (and how they compare to the baseline, if there is one) and returns the regressions
+    regressions = []
+    print(f'{"case":45} {"phase":15} {"games":>7} {"best ms":>10} {"us/game":>9}' + (f' {"vs base":>8}' if baseline else ''))
+    for record in results:
+        line = f'{record["case"]:45} {record["phase"]:15} {record["games"]:7} {record["best"] * 1000:10.2f} {record["us_per_game"]:9.2f}'
+        base_record = baseline.get((record['case'], record['phase'])) if baseline else None
+        if base_record:
+            ratio = record['best'] / base_record['best']
+            line += f' {ratio:7.2f}x'
+            if ratio > threshold:
+                line += ' REGRESSION'
+                regressions.append(record)
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time parsing, rendering and validating the sample and synthetic schedules')
+    parser.add_argument('-r', '--repeat', help='number of times to run each phase (the best time is used)', default=5, type=int)
+    parser.add_argument('--scale', help='size of the synthetic seasons compared to a regular season (can be given more than once)',
+                        action='append', type=int)
+    parser.add_argument('--axis', help='which part of the synthetic seasons to scale up (can be given more than once)',
+                        action='append', choices=SYNTHETIC_AXES)
+    parser.add_argument('--no-samples', help='only run the synthetic seasons', action='store_true')
+    parser.add_argument('-o', '--output', help='write the results to this file (json lines) for comparing later')
+    parser.add_argument('--compare', help='results file from an earlier run to compare against')
+    parser.add_argument('--threshold', help='how many times slower than the baseline counts as a regression',
+                        default=DEFAULT_REGRESSION_THRESHOLD, type=float)
+    args = parser.parse_args()
+
+    scales = args.scale or [1, 10]
+    axes = args.axis or SYNTHETIC_AXES
+    baseline = load_results(args.compare) if args.compare else None
+
+    results = []
+    for name, csv_text in get_cases(scales, axes, not args.no_samples):
+        results.extend(benchmark_case(name, csv_text, args.repeat))
+    regressions = print_results(results, baseline, args.threshold)
+
+    if args.output:
+        save_results(args.output, results)
+    if regressions:
+        print(f'{len(regressions)} result(s) more than {args.threshold}x slower than {args.compare}')
+        return EXIT_REGRESSION
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
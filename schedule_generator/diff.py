@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import re
+import sys
+
+from generator import SHARED_ASSET_FILENAMES, read_schedule, render_season, write_file_atomic, write_output
+
+# Exit codes for the command line (same as the diff command: 0 if nothing changed)
+EXIT_NO_CHANGES = 0
+EXIT_CHANGES = 1
+
+# Types of changes in the changelog
+CHANGE_GAME_MOVED = 'game_moved'
+CHANGE_GAME_ADDED = 'game_added'
+CHANGE_GAME_REMOVED = 'game_removed'
+CHANGE_REF_CHANGED = 'ref_changed'
+CHANGE_REFS_SWAPPED = 'refs_swapped'
+CHANGE_BYE_ADDED = 'bye_added'
+CHANGE_BYE_REMOVED = 'bye_removed'
+
+# The team index line in a (full, not compact) page, which has to be updated along with the week blocks
+TEAM_INDEX_RE = re.compile(r'const teamIndex = (\{.*\});$', re.MULTILINE)
+
+
+def get_games_by_slot(sked):
+    # Every game (and open play/skills clinic slot) in the season keyed on (week, time slot, court)
+    games = {}
+    for week_title in sked.week_titles:
+        week_sked = sked.weekly_skeds[week_title]
+        for time_slot in week_sked.time_slots:
+            for court, game in week_sked.time_slot_skeds[time_slot].time_slot_games.items():
+                games[(week_title, time_slot, court)] = game
+    return games
+
+
+def get_matchup(game):
+    # What makes two games the same game, wherever (and whenever) they're played. The ref doesn't count
+    if game.is_skills_clinic:
+        return ('skills_clinic', game.skills_clinic_title)
+    if game.is_open_play:
+        return ('open_play', game.open_play_title)
+    return frozenset((game.team_1, game.team_2))
+
+
+def describe_game(game):
+    # Same fields as the games returned by server.py
+    if game.is_skills_clinic:
+        return {'skills_clinic': game.skills_clinic_title}
+    if game.is_open_play:
+        return {'open_play': game.open_play_title}
+    return {'team_1': game.team_1, 'team_2': game.team_2, 'ref': game.ref_team}
+
+
+def describe_slot(slot):
+    week_title, time_slot, court = slot
+    return {'week': week_title, 'time': time_slot, 'court': court}
+
+
+def week_layout_changed(old_week_sked, new_week_sked):
+    # Changes to a week that aren't about a particular game or bye but still change how the week looks
+    return (old_week_sked.is_tba != new_week_sked.is_tba or
+            old_week_sked.time_slots != new_week_sked.time_slots or
+            old_week_sked.start_time_changed != new_week_sked.start_time_changed or
+            old_week_sked.bye_week_teams != new_week_sked.bye_week_teams)
+
+
+def diff_schedules(old_sked, new_sked):
+    # Compares two exports of a season game by game, keyed on (week, time slot, court). Returns the changelog
+    # (a dict that can be written out as json) and marks every changed game and bye in new_sked so that they
+    # get highlighted when it's rendered. Only the changed slots are looked at after the first pass, so the
+    # work after that is proportional to the size of the change rather than the season
+    old_games = get_games_by_slot(old_sked)
+    new_games = get_games_by_slot(new_sked)
+    changes = []
+    changed_weeks = set()
+    removed = []
+    added = []
+    ref_changes = []
+    for slot, new_game in new_games.items():
+        old_game = old_games.get(slot)
+        if old_game is None:
+            added.append((slot, new_game))
+        elif get_matchup(old_game) != get_matchup(new_game):
+            removed.append((slot, old_game))
+            added.append((slot, new_game))
+        elif old_game.ref_team != new_game.ref_team:
+            ref_changes.append((slot, old_game.ref_team, new_game))
+    removed.extend((slot, old_game) for slot, old_game in old_games.items() if slot not in new_games)
+
+    def mark(slot):
+        week_title, time_slot, court = slot
+        if slot in new_games:
+            new_sked.weekly_skeds[week_title].updated_games.add((time_slot, court))
+        changed_weeks.add(week_title)
+
+    # A game that was taken out of one slot and put into another has moved (the first match wins if the
+    # same two teams play each other more than once)
+    added_by_matchup = {}
+    for slot, new_game in added:
+        added_by_matchup.setdefault(get_matchup(new_game), []).append((slot, new_game))
+    for old_slot, old_game in removed:
+        candidates = added_by_matchup.get(get_matchup(old_game))
+        mark(old_slot)
+        if candidates:
+            new_slot, new_game = candidates.pop(0)
+            change = dict(type=CHANGE_GAME_MOVED, **describe_game(new_game))
+            change['from'] = describe_slot(old_slot)
+            change['to'] = describe_slot(new_slot)
+            if old_game.ref_team != new_game.ref_team:
+                change['old_ref'] = old_game.ref_team
+            changes.append(change)
+            mark(new_slot)
+        else:
+            changes.append(dict(type=CHANGE_GAME_REMOVED, **describe_slot(old_slot), **describe_game(old_game)))
+    # Whatever is left over is a new game
+    unmatched = {slot for candidates in added_by_matchup.values() for slot, new_game in candidates}
+    for slot, new_game in added:
+        if slot in unmatched:
+            changes.append(dict(type=CHANGE_GAME_ADDED, **describe_slot(slot), **describe_game(new_game)))
+            mark(slot)
+
+    # Two refs trading places in the same week is listed as a single swap
+    swapped = set()
+    for idx, (slot, old_ref, new_game) in enumerate(ref_changes):
+        if idx in swapped:
+            continue
+        for other_idx in range(idx + 1, len(ref_changes)):
+            other_slot, other_old_ref, other_new_game = ref_changes[other_idx]
+            if (other_idx not in swapped and other_slot[0] == slot[0] and
+                    other_old_ref == new_game.ref_team and other_new_game.ref_team == old_ref):
+                swapped.update((idx, other_idx))
+                changes.append({
+                    'type': CHANGE_REFS_SWAPPED,
+                    'week': slot[0],
+                    'refs': [old_ref, new_game.ref_team],
+                    'games': [dict(describe_slot(slot), **describe_game(new_game)),
+                              dict(describe_slot(other_slot), **describe_game(other_new_game))],
+                })
+                mark(slot)
+                mark(other_slot)
+                break
+        else:
+            changes.append(dict(type=CHANGE_REF_CHANGED, **describe_slot(slot), **describe_game(new_game), old_ref=old_ref))
+            mark(slot)
+
+    # Byes are compared per week, and the rest of each week's layout is checked so any week that would look
+    # different gets rewritten even if none of its games changed
+    for week_title in new_sked.week_titles:
+        new_week_sked = new_sked.weekly_skeds[week_title]
+        old_week_sked = old_sked.weekly_skeds.get(week_title)
+        if old_week_sked is None:
+            changed_weeks.add(week_title)
+            old_byes = set()
+        else:
+            if week_layout_changed(old_week_sked, new_week_sked):
+                changed_weeks.add(week_title)
+            old_byes = set(old_week_sked.bye_week_teams)
+        for team in new_week_sked.bye_week_teams:
+            if team not in old_byes:
+                changes.append({'type': CHANGE_BYE_ADDED, 'week': week_title, 'team': team})
+                new_week_sked.updated_byes.add(team)
+        removed_byes = old_byes.difference(new_week_sked.bye_week_teams)
+        for team in sorted(removed_byes):
+            changes.append({'type': CHANGE_BYE_REMOVED, 'week': week_title, 'team': team})
+
+    summary = {}
+    for change in changes:
+        summary[change['type']] = summary.get(change['type'], 0) + 1
+    return {
+        'old': old_sked.title,
+        'new': new_sked.title,
+        'changes': changes,
+        'changed_weeks': [week_title for week_title in new_sked.week_titles if week_title in changed_weeks],
+        'summary': summary,
+    }
+
+
+def format_game(change, with_ref=True):
+    if 'skills_clinic' in change:
+        return change['skills_clinic']
+    if 'open_play' in change:
+        return change['open_play']
+    text = change['team_1'] + ' v ' + change['team_2']
+    if with_ref:
+        text += ' (ref: ' + change['ref'] + ')'
+    return text
+
+
+def format_slot(slot):
+    return slot['week'] + ', ' + slot['time'] + ', ' + slot['court']
+
+
+def format_change(change):
+    change_type = change['type']
+    if change_type == CHANGE_GAME_MOVED:
+        text = format_game(change) + ' moved from ' + format_slot(change['from']) + ' to ' + format_slot(change['to'])
+        if 'old_ref' in change:
+            text += ' (was reffed by ' + change['old_ref'] + ')'
+        return text
+    if change_type == CHANGE_GAME_ADDED:
+        return format_slot(change) + ': ' + format_game(change) + ' added'
+    if change_type == CHANGE_GAME_REMOVED:
+        return format_slot(change) + ': ' + format_game(change) + ' removed'
+    if change_type == CHANGE_REF_CHANGED:
+        return (format_slot(change) + ': ref for ' + format_game(change, with_ref=False) + ' changed from ' +
+                change['old_ref'] + ' to ' + change['ref'])
+    if change_type == CHANGE_REFS_SWAPPED:
+        first, second = change['games']
+        return (change['week'] + ': ' + change['refs'][0] + ' and ' + change['refs'][1] + ' swapped refs (' +
+                first['time'] + ' ' + first['court'] + ' and ' + second['time'] + ' ' + second['court'] + ')')
+    if change_type == CHANGE_BYE_ADDED:
+        return change['week'] + ': ' + change['team'] + ' now has a bye'
+    return change['week'] + ': ' + change['team'] + ' no longer has a bye'
+
+
+def print_changelog(changelog):
+    changes = changelog['changes']
+    if not changes:
+        print(f'{changelog["new"]}: no changes')
+        return
+    print(f'{changelog["new"]}: {len(changes)} change(s) in {len(changelog["changed_weeks"])} week(s)')
+    for change in changes:
+        print('  ' + format_change(change))
+
+
+def same_layout(old_sked, new_sked):
+    # Only the week blocks can be patched, so everything outside of them has to be the same
+    return (old_sked.title == new_sked.title and
+            old_sked.court_titles == new_sked.court_titles and
+            old_sked.week_titles == new_sked.week_titles and
+            old_sked.no_play_weeks == new_sked.no_play_weeks and
+            old_sked.get_team_counts() == new_sked.get_team_counts())
+
+
+def get_week_block_re(week_num):
+    return re.compile(r'<tbody id="week_' + str(week_num) + r'">\n.*?</tbody>\n', re.DOTALL)
+
+
+def render_changed_week(sked, week_title, team_index):
+    # Same as render_table does for this week
+    week_num = sked.week_titles.index(week_title)
+    no_play_weeks_after = []
+    if sked.weekly_skeds[week_title].is_tba:
+        no_play_weeks_after = sked.get_no_play_weeks_by_prev_week().get(week_title, [])
+    return sked.render_week(week_num, week_title, no_play_weeks_after, team_index)
+
+
+def patch_page(page_html, old_sked, new_sked, changed_weeks):
+    # Rewrites only the changed week blocks (and their entries in the team index) of a page that was generated
+    # from old_sked. Returns None if the page can't be patched (e.g. it's a compact page, it wasn't generated
+    # from old_sked or something outside of the week blocks changed), in which case it needs a full re-render
+    if not same_layout(old_sked, new_sked):
+        return None
+    team_index_match = TEAM_INDEX_RE.search(page_html)
+    if not team_index_match:
+        return None
+    team_index = json.loads(team_index_match.group(1))
+    # Marks from the last time the page was patched are cleared, only the latest changes are highlighted
+    page_html = page_html.replace(' updated"', '"')
+    week_nums = set()
+    new_entries = {}
+    for week_title in changed_weeks:
+        week_num = new_sked.week_titles.index(week_title)
+        week_nums.add(week_num)
+        week_block_match = get_week_block_re(week_num).search(page_html)
+        # Make sure the page really has the old version of this week before replacing it
+        if not week_block_match or week_block_match.group(0) != render_changed_week(old_sked, week_title, {}):
+            return None
+        new_block = render_changed_week(new_sked, week_title, new_entries)
+        page_html = page_html[:week_block_match.start()] + new_block + page_html[week_block_match.end():]
+    # Swap the entries for the changed weeks in the team index, then put everything back in the order
+    # render_table adds it in (by week, row and cell) so the patched page is the same as a fresh build
+    patched_index = {}
+    for key, entries in team_index.items():
+        kept_entries = [entry for entry in entries if entry[0] not in week_nums]
+        if kept_entries:
+            patched_index[key] = kept_entries
+    for key, entries in new_entries.items():
+        patched_index.setdefault(key, []).extend(entries)
+    for entries in patched_index.values():
+        entries.sort()
+    patched_index = dict(sorted(patched_index.items(), key=lambda item: item[1][0]))
+    team_index_line = 'const teamIndex = ' + json.dumps(patched_index, separators=(',', ':')) + ';'
+    return TEAM_INDEX_RE.sub(lambda match: team_index_line, page_html, count=1)
+
+
+def get_asset_urls(page_html):
+    # Urls of the shared styles/scripts an existing page links to (None if it has its own copies)
+    asset_urls = {}
+    for asset_filename in SHARED_ASSET_FILENAMES:
+        name, extension = os.path.splitext(asset_filename)
+        match = re.search(r'(?:href|src)="([^"]*\b' + re.escape(name) + r'\.[0-9a-f]{10}' + re.escape(extension) + ')"', page_html)
+        if match:
+            asset_urls[asset_filename] = match.group(1)
+    return asset_urls or None
+
+
+def update_page(page_filename, old_sked, new_sked, changelog, output_filename=None):
+    # Patches the changed weeks of an existing page (or re-renders all of it if that isn't possible, keeping
+    # the output mode and shared assets the page was built with). Returns True if the page was patched
+    with open(page_filename, 'r') as page_file:
+        page_html = page_file.read()
+    output_filename = output_filename or page_filename
+    new_html = patch_page(page_html, old_sked, new_sked, changelog['changed_weeks'])
+    patched = new_html is not None
+    if not patched:
+        compact = 'renderSchedule(' in page_html
+        new_html = render_season(new_sked, compact, get_asset_urls(page_html))
+    # Keep any precompressed copies of the page up to date too
+    write_output(output_filename, new_html, precompress=os.path.exists(page_filename + '.gz'))
+    return patched
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two exports of a season schedule and list what changed')
+    parser.add_argument('old_csv', help='csv of the schedule before the changes')
+    parser.add_argument('new_csv', help='csv of the schedule after the changes')
+    parser.add_argument('-s', '--start-col', help='first non-empty column of both csvs (detected if not given)', type=int)
+    parser.add_argument('-j', '--json', help='print the changelog as json', action='store_true')
+    parser.add_argument('-c', '--changelog', help='also write the changelog (json) to this file')
+    parser.add_argument('-p', '--page', help='page generated from the old csv to update with the changes (highlighted)')
+    parser.add_argument('-o', '--output', help='write the updated page here instead of over the page')
+    args = parser.parse_args()
+
+    old_sked = read_schedule(args.old_csv, args.start_col)
+    new_sked = read_schedule(args.new_csv, args.start_col)
+    changelog = diff_schedules(old_sked, new_sked)
+    if args.json:
+        print(json.dumps(changelog, indent=2))
+    else:
+        print_changelog(changelog)
+    if args.changelog:
+        write_file_atomic(args.changelog, json.dumps(changelog, indent=2))
+    if args.page:
+        output_filename = args.output or args.page
+        if update_page(args.page, old_sked, new_sked, changelog, output_filename):
+            print(f'Updated {len(changelog["changed_weeks"])} week(s) of {output_filename}')
+        else:
+            print(f'Could not patch {args.page} (it is compact or not from {args.old_csv}), re-rendered all of {output_filename}')
+    return EXIT_CHANGES if changelog['changes'] else EXIT_NO_CHANGES
+
+
+if __name__ == "__main__":
+    sys.exit(main())
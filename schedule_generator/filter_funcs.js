@@ -1,11 +1,5 @@
+// NOTE: numTeamsPerLevel (number of teams in each division) is defined by the generated page
 function getLowerLevel(teamName) {
-  const numTeamsPerLevel = {
-    "REC": 1,
-    "INT": 1,
-    "COM": 1,
-    "POW": 1,
-    "P+": 1
-  };
   const levelBelowMapping = {
     "INT": "REC",
     "COM": "INT",
@@ -34,26 +28,45 @@ function getLowerLevel(teamName) {
   return {"teams": [], "clsName": ""};
 }
 
-function showAll() {
-  // Get the schedule table element and it's rows
-  let table = document.getElementById("myTable");
-  let tr = table.getElementsByTagName("tr");
-  // Reset all hidden/highlighted rows/cols to make sure everything is shown
-  for (let row = 0; row < tr.length; row++) {
-    tr[row].style.display = "";
-    let td = tr[row].getElementsByTagName("td");
-    for (let col = 0; col < td.length; col++) {
-      if (td[col].classList.contains("highlighted")) {
-        td[col].classList.remove("highlighted");
-      }
-      if (td[col].classList.contains("hidden")) {
-        td[col].classList.remove("hidden");
-      }
-      if (td[col].classList.contains("bye_hidden")) {
-        td[col].classList.remove("bye_hidden");
-      }
-    }
+// Kinds of cells listed in teamIndex (must match the INDEX_* values in generator.py)
+const TEAM_1 = 0;
+const TEAM_2 = 1;
+const REF = 2;
+const BYE = 3;
+const SPECIAL = 4;
+
+// Rows and cells marked by the last filter, so they can be reset without scanning the whole table
+let markedElements = [];
+
+// Rows of the weeks that haven't been put in the table yet, keyed on week number (compact pages only add
+// each week to the table when it's needed, see render_funcs.js)
+let pendingWeeks = {};
+
+function getWeekBody(week) {
+  const tbody = document.getElementById("week_" + week);
+  if (week in pendingWeeks) {
+    tbody.innerHTML = pendingWeeks[week].join("\n");
+    delete pendingWeeks[week];
   }
+  return tbody;
+}
+
+function markElement(element, clsName) {
+  element.classList.add(clsName);
+  markedElements.push(element);
+}
+
+function clearMarkedElements() {
+  for (const element of markedElements) {
+    element.classList.remove("shown", "highlighted");
+  }
+  markedElements = [];
+}
+
+function showAll() {
+  // The marks only have an effect while the table has the "filtered" class, so un-filtering the table is a
+  // single class change (the marks are cleared by the next filter)
+  document.getElementById("myTable").classList.remove("filtered");
 }
 
 // NOTE: We assume all of the params passed in are defined!
@@ -64,89 +77,55 @@ function filterSchedule(firstTeam, secondTeam, showOpenPlay, showSkillsClinic) {
     return;
   }
 
-  // Get the schedule table element and it's rows and iterate over them
-  let table = document.getElementById("myTable");
-  let tr = table.getElementsByTagName("tr");
-  for (let row = 0; row < tr.length; row++) {
-    // First check for row types that are always shown
-    const trClass = tr[row].className;
-    if (trClass == "header" || trClass == "week" || trClass == "spacer") {
-      // Since we never hide these rows, we don't need to unhide them either... just skip
-      continue;
-    }
-    // Next see if this row contains any mention of the selected filters
-    // For regular rows, we also need to keep track of what surrounding cols were in the same court
-    let highlightCols = [];
-    let displayCols = [];
-    let td = tr[row].getElementsByTagName("td");
-    // NOTE: We ignore column 0 (time column) because it's always shown and never highlighted
-    for (let col = 1; col < td.length; col++) {
-      if (td[col]) {
-        // We only care about team/bye/open_play/skills_clinic columns so ignore the rest
-        const clsList = td[col].classList;
-        const tdValue = td[col].textContent.toUpperCase();
-        if (clsList.contains("team1")) {
-          if (tdValue == firstTeam || tdValue == secondTeam) {
-            highlightCols.push(col);
-            displayCols.push(col, col + 1, col + 2, col + 3, col + 4);
-          }
-        } else if (clsList.contains("team2")) {
-          if (tdValue == firstTeam || tdValue == secondTeam) {
-            highlightCols.push(col);
-            displayCols.push(col + -2, col - 1, col, col + 1, col + 2);
-          }
-        } else if (clsList.contains("team_ref")) {
-          if (tdValue == firstTeam || tdValue == secondTeam) {
-            highlightCols.push(col - 1, col);
-            displayCols.push(col - 4, col - 3, col + -2, col - 1, col);
-          }
-        } else if (clsList.contains("bye")) {
-          if (tdValue == firstTeam || tdValue == secondTeam) {
-            highlightCols.push(col);
-            displayCols.push(col);
-          }
-        } else {
-          // Lastly check for open play and skills clinic cols
-          if ((clsList.contains("open_play") && showOpenPlay) ||
-              (clsList.contains("skills_clinic") && showSkillsClinic)) {
-            displayCols.push(col);
-          }
-        }
+  // Reset whatever the previous filter marked
+  clearMarkedElements();
+
+  // Figure out which entries of the team index we need to look at
+  let indexKeys = [firstTeam];
+  if (secondTeam) {
+    indexKeys.push(secondTeam);
+  }
+  if (showOpenPlay) {
+    indexKeys.push("OPEN_PLAY");
+  }
+  if (showSkillsClinic) {
+    indexKeys.push("SKILLS_CLINIC");
+  }
+
+  // Only the rows/cells listed in the index are touched: matching rows and cells are marked as
+  // shown (and highlighted), everything else is hidden by the "filtered" class on the table
+  for (const indexKey of indexKeys) {
+    const entries = teamIndex[indexKey] || [];
+    for (const [week, row, col, kind] of entries) {
+      const tr = getWeekBody(week).rows[row];
+      const td = tr.cells;
+      markElement(tr, "shown");
+      let displayCols = [];
+      let highlightCols = [];
+      if (kind == TEAM_1) {
+        highlightCols.push(col);
+        displayCols.push(col, col + 1, col + 2, col + 3, col + 4);
+      } else if (kind == TEAM_2) {
+        highlightCols.push(col);
+        displayCols.push(col - 2, col - 1, col, col + 1, col + 2);
+      } else if (kind == REF) {
+        highlightCols.push(col - 1, col);
+        displayCols.push(col - 4, col - 3, col - 2, col - 1, col);
+      } else if (kind == BYE) {
+        highlightCols.push(col);
+        displayCols.push(col);
+      } else if (kind == SPECIAL) {
+        displayCols.push(col);
       }
-    }
-    // If displayCols is empty we can just hide the whole row
-    if (displayCols.length == 0) {
-      tr[row].style.display = "none";
-    } else {
-      // Make sure this row is unhidden in case it was previously hidden
-      tr[row].style.display = "";
-      // Now we can set or unset the hidden/highlighted classes for each col
-      // NOTE: We ignore column 0 (time column) because it's always shown and never highlighted
-      for (let col = 1; col < td.length; col++) {
-        // Highlight column if necessary
-        if (highlightCols.includes(col)) {
-          if (!td[col].classList.contains("highlighted")) {
-            td[col].classList.add("highlighted");
-          }
-        } else if (td[col].classList.contains("highlighted")) {
-          // Remove highlighting if previously highlighted
-          td[col].classList.remove("highlighted");
-        }
-        // For hiding/displaying cols, we need to know if it's a bye week row
-        const isByeWeekRow = (td[0].textContent == "Bye Week");
-        const hiddenClsName = isByeWeekRow ? "bye_hidden" : "hidden";
-        if (displayCols.includes(col)) {
-          // Unhide this col if necessary
-          if (td[col].classList.contains(hiddenClsName)) {
-            td[col].classList.remove(hiddenClsName);
-          }
-        } else if (!td[col].classList.contains(hiddenClsName)) {
-          // Make sure this col is hidden
-          td[col].classList.add(hiddenClsName);
-        }
+      for (const displayCol of displayCols) {
+        markElement(td[displayCol], "shown");
+      }
+      for (const highlightCol of highlightCols) {
+        markElement(td[highlightCol], "highlighted");
       }
     }
   }
+  document.getElementById("myTable").classList.add("filtered");
 }
 
 function handleOptionalFiltersChange() {
@@ -209,4 +188,43 @@ function handleFirstTeamSelectChange() {
   }
   // Finally filter the schedule based on the first team selection
   return filterSchedule(filteredTeam, "", showOpenPlay.checked, showSkillsClinic.checked);
+}
+
+function getToday() {
+  // Today's date in the same format as weekDates (YYYY-MM-DD), in the local time zone
+  const now = new Date();
+  return now.getFullYear() + "-" + String(now.getMonth() + 1).padStart(2, "0") + "-" + String(now.getDate()).padStart(2, "0");
+}
+
+// NOTE: weekDates (date of each week, or null if its title has no date) is defined by the generated page
+function collapsePastWeeks() {
+  // Weeks before this week are collapsed down to their title rows, so this week's games are at the top
+  // of the page. Nothing is collapsed before the season starts or after it's over
+  const thisWeek = weekDates.findIndex(weekDate => weekDate !== null && weekDate >= getToday());
+  if (thisWeek <= 0) {
+    return;
+  }
+  const table = document.getElementById("myTable");
+  const thisWeekBody = document.getElementById("week_" + thisWeek);
+  // The first tbody is the court headers
+  for (let idx = 1; idx < table.tBodies.length && table.tBodies[idx] !== thisWeekBody; idx++) {
+    table.tBodies[idx].classList.add("past");
+  }
+  document.getElementById("past_weeks_toggle").style.display = "block";
+  // Links to the page can end in #this_week to jump straight to it
+  if (window.location.hash == "#this_week") {
+    thisWeekBody.scrollIntoView();
+  }
+}
+
+function togglePastWeeks() {
+  const table = document.getElementById("myTable");
+  const showPast = table.classList.toggle("show_past");
+  if (showPast) {
+    for (const tbody of table.querySelectorAll("tbody.past[id]")) {
+      getWeekBody(tbody.id.slice("week_".length));
+    }
+  }
+  document.getElementById("past_weeks_link").textContent = showPast ? "Hide earlier weeks" : "Show earlier weeks";
+  return false;
 }
\ No newline at end of file
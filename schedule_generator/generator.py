@@ -1,11 +1,146 @@
 #!/usr/bin/env python3
 
 import argparse
+import contextlib
+import cProfile
 import csv
+import datetime
+import functools
+import gzip
+import hashlib
+import json
+import os
+import pstats
+import re
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import brotli  # optional, only used to write .br versions of the output when precompressing
+except ImportError:
+    brotli = None
+
+# Supporting files (styles and scripts) live next to this script
+ASSETS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Styles, scripts and the page template that go into every generated page
+TEMPLATE_FILENAMES = ['style.css', 'filter_funcs.js', 'render_funcs.js', 'page_template.html', 'team_page_template.html']
+
+# Files that the generated html depends on (besides the csv), used to detect when a rebuild is needed
+ASSET_FILENAMES = TEMPLATE_FILENAMES + [os.path.basename(__file__)]
+
+# Styles and scripts that can be written once as shared files (into this subfolder of the output folder)
+# instead of being included in every page
+SHARED_ASSET_FILENAMES = ['style.css', 'filter_funcs.js', 'render_funcs.js']
+SHARED_ASSETS_DIR = 'assets'
+
+# Number of functions (or lines, for allocations) printed when profiling a build
+PROFILE_TOP_COUNT = 20
+
+# Build manifest (written to the output folder) used to skip seasons whose inputs haven't changed
+MANIFEST_FILENAME = '.build_manifest.json'
+
+# Kinds of cells listed in the team index embedded in the html (must match filter_funcs.js)
+INDEX_TEAM_1 = 0
+INDEX_TEAM_2 = 1
+INDEX_REF = 2
+INDEX_BYE = 3
+INDEX_SPECIAL = 4
+
+# What a team is doing in each entry of its per-team schedule
+TEAM_PLAYS = 'plays'
+TEAM_REFS = 'refs'
+TEAM_BYE = 'bye'
+
+# Per-team pages and calendars are written to this subfolder of the output folder
+TEAMS_DIR = 'teams'
+
+# Length of each game in the per-team calendars (the schedule only lists start times)
+GAME_LENGTH = datetime.timedelta(minutes=60)
+
+# Used to work out the date of each week from the week titles (e.g. 'Week 2: Sep 15' or '16-Apr')
+MONTHS = {'JAN': 1, 'FEB': 2, 'MAR': 3, 'APR': 4, 'MAY': 5, 'JUN': 6,
+          'JUL': 7, 'AUG': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DEC': 12}
+
+# How often (in seconds) watch mode checks for changes, and how long the csv(s) must stay unchanged
+# before rebuilding (saving/downloading a file often shows up as several changes in a row)
+WATCH_POLL_INTERVAL = 1.0
+WATCH_DEBOUNCE_DELAY = 0.5
+
+# Types of (non-empty) rows in the schedule csv
+ROW_TITLE = 'title'
+ROW_COURTS = 'courts'
+ROW_WEEK_TITLE = 'week_title'
+ROW_TBA = 'tba'
+ROW_NO_PLAY_WEEK = 'no_play_week'
+ROW_TIME_SLOT = 'time_slot'
+
+# Divisions from the lowest level up (a team's name is its division followed by its number, e.g. REC3) and
+# the class its teams are shown with on the page (must match style.css and filter_funcs.js)
+DIVISIONS = ['REC', 'INT', 'COM', 'POW', 'P+']
+DIVISION_CLASSES = {'REC': 'rec', 'INT': 'int', 'COM': 'com', 'POW': 'pow', 'P+': 'pow_plus'}
+
+# Used to sort the seasons listed in index.html (oldest first)
+SEASON_ORDER = {'WINTER': 0, 'SPRING': 1, 'SUMMER': 2, 'FALL': 3}
+
+
+def get_cell(row, col_num):
+    # Rows in the csv aren't guaranteed to all be the same length
+    if 0 <= col_num < len(row):
+        return row[col_num]
+    return ''
+
+
+def get_division(team_name):
+    # None for anything that isn't a team (e.g. a typo in the sheet)
+    for division in DIVISIONS:
+        if team_name.startswith(division):
+            return division
+    return None
+
+
+def parse_month_day(text):
+    # Finds the first 'Sep 15' or '16-Apr' style date in the text and returns (month, day)
+    for match in re.finditer(r'\b([A-Za-z]{3})[A-Za-z]*\.?\s+(\d{1,2})\b|\b(\d{1,2})-([A-Za-z]{3})', text):
+        month_name, day = (match.group(1), match.group(2)) if match.group(1) else (match.group(4), match.group(3))
+        if month_name.upper() in MONTHS:
+            return MONTHS[month_name.upper()], int(day)
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def parse_time_slot(time_slot):
+    # e.g. '3:30 PM' -> 15:30 (None if the time slot isn't a time). strptime is slow and there are only a
+    # handful of different time slots, so each one is only parsed once
+    try:
+        return datetime.datetime.strptime(time_slot.strip(), '%I:%M %p').time()
+    except ValueError:
+        return None
+
+
+def ics_escape(text):
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def ics_fold(line):
+    # Lines in an iCalendar file are limited to 75 characters, longer ones continue on the next line after a space
+    folded = [line[:75]]
+    for idx in range(75, len(line), 74):
+        folded.append(' ' + line[idx:idx + 74])
+    return '\r\n'.join(folded)
 
 
 class Schedule:
+    # NOTE: These classes use __slots__ (instead of a per object __dict__) since there is one of them for
+    # every game/time slot/week, which adds up quickly when parsing many seasons or lots of courts
     class SingleGameInfo:
+        __slots__ = ('is_skills_clinic', 'skills_clinic_title', 'is_open_play', 'open_play_title',
+                     'court_name', 'team_1', 'team_2', 'ref_team')
+
         def __init__(self):
             self.is_skills_clinic = False
             self.skills_clinic_title = ''
@@ -17,17 +152,26 @@ class Schedule:
             self.ref_team = ''
 
     class SingleTimeSlotSchedule:
+        __slots__ = ('time_slot_title', 'time_slot_games')
+
         def __init__(self):
             self.time_slot_title = ''
             self.time_slot_games = {}
 
     class SingleWeekSchedule:
+        __slots__ = ('is_tba', 'time_slots', 'time_slot_skeds', 'bye_week_teams', 'start_time_changed',
+                     'updated_games', 'updated_byes')
+
         def __init__(self):
             self.is_tba = False
             self.time_slots = []
             self.time_slot_skeds = {}
             self.bye_week_teams = []
             self.start_time_changed = False
+            # (time slot, court) of games and names of bye teams that changed since the previous export of
+            # the schedule (filled in by diff.py), which get highlighted on the page
+            self.updated_games = set()
+            self.updated_byes = set()
 
     def __init__(self):
         self.title = 'Unknown Season'
@@ -42,6 +186,11 @@ class Schedule:
         self.no_play_weeks = []
         self.bye_week_col_num = -1
         self.usual_start_time = "3:30 PM"
+        # Layout of the csv (detected while parsing): first used column and the column of each court's games
+        self.start_col = None
+        self.court_col_nums = []
+        # Number of csv rows read (including empty ones)
+        self.num_rows = 0
 
     def update_team_counts(self, team_name):
         if team_name.startswith('REC'):
@@ -65,269 +214,540 @@ class Schedule:
             if team_number > self.num_pow_plus_teams:
                 self.num_pow_plus_teams = team_number
 
-    def parse_rows(self, csv_reader, start_col, debug):
-        curr_week = ''
+    def get_season_name(self):
+        # e.g. 'SCVL FALL 2025 SEASON SCHEDULE' -> ('FALL', '2025')
+        match = re.search(r'(WINTER|SPRING|SUMMER|FALL)\s+(\d{4})', self.title.upper())
+        if match:
+            return match.group(1), match.group(2)
+        return None
+
+    def get_page_filename(self):
+        season_name = self.get_season_name()
+        if season_name:
+            return season_name[0].lower() + '-' + season_name[1] + '.html'
+        # Fall back to a slug of the title if it doesn't look like a regular season
+        return re.sub(r'[^a-z0-9]+', '-', self.title.lower()).strip('-') + '.html'
+
+    def get_index_title(self):
+        season_name = self.get_season_name()
+        if season_name:
+            return season_name[0].capitalize() + ' ' + season_name[1] + ' SCVL Schedule'
+        return self.title
+
+    def detect_start_col(self, row):
+        # The overall title ('SCVL ...') and the first court title are always one column to the right of
+        # the first used column, so we can use whichever of those rows comes first to find it
+        for idx in range(1, len(row)):
+            if row[idx].startswith('SCVL') or row[idx].startswith('Court'):
+                return idx - 1
+        return None
+
+    def iter_schedule_rows(self, csv_reader, start_col=None):
+        # Streams the csv rows one at a time, yielding (row type, row) for every non-empty row. If start_col
+        # isn't given, it is detected from the title (or court list) row and anything before it is ignored
+        self.start_col = start_col
+        self.num_rows = 0
         for row in csv_reader:
-            if any(row): # ignore empty spacer rows
-                if not row[start_col]: # this is a header row
-                    if not row[start_col + 1]: # This is a week title row
-                        curr_week = row[start_col + 2]
-                        self.week_titles.append(curr_week)
-                        self.weekly_skeds[curr_week] = self.SingleWeekSchedule()
-                        # Check if this is a regular week or a special week (schedule tba)
-                        if not curr_week.startswith('Week'):
-                            self.weekly_skeds[curr_week].is_tba = True
-                        # Find the column number for bye weeks (if not yet found)
-                        if self.bye_week_col_num == -1:
-                            for idx in range(len(row)):
-                                if row[idx] == 'BYE':
-                                    self.bye_week_col_num = idx + 1
-                    elif row[start_col + 1].startswith('SCVL'): # This is the overall title row (only one at the start)
-                        self.title = row[start_col + 1]
-                        continue
-                    elif row[start_col + 1].startswith('Court'): # Row for list of courts (can appear multiple times)
-                        self.court_titles = list(filter(None, row))
-                    elif row[start_col + 1].startswith('SCHEDULE'): # Row for weeks where schedule is still TBA (to be announced)
-                        self.weekly_skeds[curr_week].is_tba = True
-                    else: # This is a no-play week (or playoff week, but we treat both the same)
-                        self.no_play_weeks.append({'title': row[start_col + 1], 'prev_week': curr_week})
-                else: # this is a time slot row
-                    # Extract the schedule for this time slot on this week
-                    time_slot_title = row[start_col]
-                    time_slot_sked = self.SingleTimeSlotSchedule()
-                    time_slot_sked.time_slot_title = time_slot_title
-                    # If this is the first time slot for the current week schedule, check if the start time is changed
-                    if len(self.weekly_skeds[curr_week].time_slots) == 0:
-                        if time_slot_title != self.usual_start_time:
-                            self.weekly_skeds[curr_week].start_time_changed = True
-                    if debug:
-                        print(curr_week, ' ', time_slot_title)
-                    for court_idx in range(len(self.court_titles)):
-                        game_info = self.SingleGameInfo()
-                        game_info.court_name = self.court_titles[court_idx]
-                        court_col_num = (court_idx * 3) + start_col + 2
-                        # Check if this court is open play or skills clinic for this time slot
-                        if 'SKILLS CLINIC' in row[court_col_num]:
-                            if debug:
-                                print(self.court_titles[court_idx], ': ', row[court_col_num])
-                            game_info.is_skills_clinic = True
-                            game_info.skills_clinic_title = row[court_col_num]
-                            if row[court_col_num + 1]:
-                                game_info.skills_clinic_title += ' (' + row[court_col_num + 1] + ')'
-                        elif 'OPEN PLAY' in row[court_col_num]:
-                            if debug:
-                                print(self.court_titles[court_idx], ': ', row[court_col_num])
-                            game_info.is_open_play = True
-                            game_info.open_play_title = row[court_col_num]
-                            if row[court_col_num + 1]:
-                                game_info.open_play_title += ' (' + row[court_col_num + 1] + ')'
-                        else:
-                            opponents = row[court_col_num].split(' v ')
-                            if debug:
-                                print(self.court_titles[court_idx], ': ', opponents)
-                            game_info.team_1 = opponents[0].replace('*', '')
-                            game_info.team_2 = opponents[1].replace('*', '')
-                            ref_str = row[court_col_num + 1]
-                            game_info.ref_team = ref_str[5:]
-                            # Use opponents from each game to determine total number of teams in each division
-                            self.update_team_counts(game_info.team_1)
-                            self.update_team_counts(game_info.team_2)
-                        time_slot_sked.time_slot_games[game_info.court_name] = game_info
-                    self.weekly_skeds[curr_week].time_slots.append(time_slot_title)
-                    self.weekly_skeds[curr_week].time_slot_skeds[time_slot_title] = time_slot_sked
-                    # check for any bye week teams in this row
-                    if row[self.bye_week_col_num]:
-                        bye_teams = [x.strip() for x in row[self.bye_week_col_num].split()]
-                        self.weekly_skeds[curr_week].bye_week_teams.extend(bye_teams)
-
-    def add_spacer_row(self, outfile):
-        outfile.write('  <tr class="spacer">\n')
-        outfile.write('    <td colspan="26" class="spacer_row"><div style="height: 20px;"></div></td>\n')
-        outfile.write('  </tr>\n\n')
-
-    def write_court_headers(self, outfile):
-        outfile.write('  <tr class="header">\n')
-        outfile.write('    <th colspna="1" style="width:7%;"></th>\n')
+            self.num_rows += 1
+            if not any(row):  # ignore empty spacer rows
+                continue
+            if self.start_col is None:
+                self.start_col = self.detect_start_col(row)
+                if self.start_col is None:
+                    continue
+            if get_cell(row, self.start_col):
+                yield ROW_TIME_SLOT, row
+                continue
+            # Everything else is some kind of header row
+            header = get_cell(row, self.start_col + 1)
+            if not header:
+                yield ROW_WEEK_TITLE, row
+            elif header.startswith('SCVL'):  # The overall title row (only one at the start)
+                yield ROW_TITLE, row
+            elif header.startswith('Court'):  # Row for list of courts (can appear multiple times)
+                yield ROW_COURTS, row
+            elif header.startswith('SCHEDULE'):  # Row for weeks where schedule is still TBA (to be announced)
+                yield ROW_TBA, row
+            else:  # This is a no-play week (or playoff week, but we treat both the same)
+                yield ROW_NO_PLAY_WEEK, row
+
+    def parse_rows(self, csv_reader, start_col=None, debug=False):
+        curr_week = ''
+        for row_type, row in self.iter_schedule_rows(csv_reader, start_col):
+            if row_type == ROW_TIME_SLOT:
+                self.parse_time_slot_row(row, curr_week, debug)
+            elif row_type == ROW_WEEK_TITLE:
+                curr_week = sys.intern(get_cell(row, self.start_col + 2))
+                self.week_titles.append(curr_week)
+                self.weekly_skeds[curr_week] = self.SingleWeekSchedule()
+                # Check if this is a regular week or a special week (schedule tba)
+                if not curr_week.startswith('Week'):
+                    self.weekly_skeds[curr_week].is_tba = True
+                # Find the column number for bye weeks (if not yet found)
+                if self.bye_week_col_num == -1:
+                    for idx in range(len(row)):
+                        if row[idx] == 'BYE':
+                            self.bye_week_col_num = idx + 1
+            elif row_type == ROW_TITLE:
+                self.title = row[self.start_col + 1]
+            elif row_type == ROW_COURTS:
+                # Each court's games are in the column to the right of the court title
+                self.court_titles = []
+                self.court_col_nums = []
+                for idx in range(len(row)):
+                    if row[idx]:
+                        self.court_titles.append(sys.intern(row[idx]))
+                        self.court_col_nums.append(idx + 1)
+            elif row_type == ROW_TBA:
+                self.weekly_skeds[curr_week].is_tba = True
+            elif row_type == ROW_NO_PLAY_WEEK:
+                self.no_play_weeks.append({'title': row[self.start_col + 1], 'prev_week': curr_week})
+
+    def parse_time_slot_row(self, row, curr_week, debug):
+        # Extract the schedule for this time slot on this week
+        week_sked = self.weekly_skeds[curr_week]
+        time_slot_title = sys.intern(row[self.start_col])
+        time_slot_sked = self.SingleTimeSlotSchedule()
+        time_slot_sked.time_slot_title = time_slot_title
+        # If this is the first time slot for the current week schedule, check if the start time is changed
+        if len(week_sked.time_slots) == 0:
+            if time_slot_title != self.usual_start_time:
+                week_sked.start_time_changed = True
+        if debug:
+            print(curr_week, ' ', time_slot_title)
+        for court_title, court_col_num in zip(self.court_titles, self.court_col_nums):
+            game_info = self.SingleGameInfo()
+            game_info.court_name = court_title
+            game_cell = get_cell(row, court_col_num)
+            extra_cell = get_cell(row, court_col_num + 1)
+            # Check if this court is open play or skills clinic for this time slot
+            if 'SKILLS CLINIC' in game_cell:
+                if debug:
+                    print(court_title, ': ', game_cell)
+                game_info.is_skills_clinic = True
+                game_info.skills_clinic_title = game_cell
+                if extra_cell:
+                    game_info.skills_clinic_title += ' (' + extra_cell + ')'
+            elif 'OPEN PLAY' in game_cell:
+                if debug:
+                    print(court_title, ': ', game_cell)
+                game_info.is_open_play = True
+                game_info.open_play_title = game_cell
+                if extra_cell:
+                    game_info.open_play_title += ' (' + extra_cell + ')'
+            else:
+                opponents = game_cell.split(' v ')
+                if debug:
+                    print(court_title, ': ', opponents)
+                # Team names repeat all season long so intern them to share a single copy of each
+                game_info.team_1 = sys.intern(opponents[0].replace('*', ''))
+                game_info.team_2 = sys.intern(opponents[1].replace('*', ''))
+                game_info.ref_team = sys.intern(extra_cell[5:])
+                # Use opponents from each game to determine total number of teams in each division
+                self.update_team_counts(game_info.team_1)
+                self.update_team_counts(game_info.team_2)
+            time_slot_sked.time_slot_games[court_title] = game_info
+        week_sked.time_slots.append(time_slot_title)
+        week_sked.time_slot_skeds[time_slot_title] = time_slot_sked
+        # check for any bye week teams in this row
+        bye_cell = get_cell(row, self.bye_week_col_num)
+        if bye_cell:
+            week_sked.bye_week_teams.extend(sys.intern(x) for x in bye_cell.split())
+
+    def spacer_row(self):
+        return ('  <tr class="spacer">\n'
+                '    <td colspan="26" class="spacer_row"><div style="height: 20px;"></div></td>\n'
+                '  </tr>\n\n')
+
+    def court_headers_row(self):
         court_col_width_pct = 75 / len(self.court_titles)
+        parts = ['  <tr class="header">\n', '    <th colspna="1" style="width:7%;"></th>\n']
         for court_title in self.court_titles:
-            outfile.write('    <th colspan="5" style="width:' + str(court_col_width_pct) + '%;">' + court_title + '</th>\n')
-        outfile.write('  </tr>\n\n')
+            parts.append('    <th colspan="5" style="width:' + str(court_col_width_pct) + '%;">' + court_title + '</th>\n')
+        parts.append('  </tr>\n\n')
+        return ''.join(parts)
 
     def get_team_division(self, team_name):
-        if 'REC' in team_name:
-            return 'rec'
-        elif 'INT' in team_name:
-            return 'int'
-        elif 'COM' in team_name:
-            return 'com'
-        elif 'POW' in team_name:
-            return 'pow'
-        elif 'P+' in team_name:
-            return 'pow_plus'
+        return DIVISION_CLASSES.get(get_division(team_name), 'unknown')
+
+    def no_play_week_row(self, no_play_week_title):
+        return ('  <tr class="week">\n'
+                '    <td colspan="26" class="no_play_week">' + no_play_week_title + '</td>\n'
+                '  </tr>\n\n')
+
+    def no_play_week_block(self, no_play_week_title):
+        return '<tbody>\n' + self.no_play_week_row(no_play_week_title) + self.spacer_row() + '</tbody>\n'
+
+    def get_no_play_weeks_by_prev_week(self):
+        # No-play weeks keyed on the title of the week they come after ('' for the start of the season)
+        no_play_weeks_by_prev_week = {}
+        for npw in self.no_play_weeks:
+            no_play_weeks_by_prev_week.setdefault(npw['prev_week'], []).append(npw['title'])
+        return no_play_weeks_by_prev_week
+
+    def get_team_counts(self):
+        return {
+            'REC': self.num_rec_teams,
+            'INT': self.num_int_teams,
+            'COM': self.num_com_teams,
+            'POW': self.num_pow_teams,
+            'P+': self.num_pow_plus_teams,
+        }
+
+    def get_all_teams(self):
+        # Every team in the season, in the same order as the team selection drop down
+        all_teams = []
+        for division, team_count in self.get_team_counts().items():
+            for i in range(1, team_count + 1):
+                all_teams.append(division + str(i))
+        return all_teams
+
+    def team_options(self):
+        parts = []
+        for team_name in self.get_all_teams():
+            parts.append('    <option class="' + self.get_team_division(team_name) + '">' + team_name + '</option>\n')
+        return ''.join(parts)
+
+    def render_page(self, table, script_filenames, page_script, asset_urls=None):
+        # Fill in the page template shared by every output mode. The scripts (followed by the script for this
+        # particular page) are included in the page, unless asset_urls gives the url of a shared copy of each
+        assets = load_assets()
+        scripts = page_script if asset_urls else ''.join(assets[f] for f in script_filenames) + page_script
+        return string.Template(assets['page_template.html']).substitute(
+            styles=style_tag(asset_urls),
+            title=self.title,
+            team_options=self.team_options(),
+            table=table,
+            script_files=script_tags(script_filenames, asset_urls),
+            team_counts=json.dumps(self.get_team_counts()),
+            week_dates=json.dumps(self.get_week_date_strings()),
+            scripts=scripts,
+        )
+
+    def render_week(self, week_num, week_title, no_play_weeks_after, team_index):
+        # Returns the tbody for a single week. While writing the rows we add every cell each team appears
+        # in to the team index (as [week number, row within the week, cell within the row, kind of cell])
+        # so that the filter script can go straight to the affected cells instead of scanning the table
+        week_sked = self.weekly_skeds[week_title]
+        parts = ['<tbody id="week_' + str(week_num) + '">\n', '  <tr class="week">\n', '    <td></td>\n']
+        if week_sked.is_tba:
+            parts.append('    <td colspan="5" class="playoff_week">' + week_title + '</td>\n')
+            parts.append('\t   <td colspan="20"></td>\n')
+        else:
+            parts.append('    <td colspan="25" class="week_row">' + week_title + '</td>\n')
+        parts.append('  </tr>\n')
+        # Write rows for each timeslot in this week's schedule
+        if week_sked.is_tba:
+            # First add any "no-play-week" titles that come after this TBA week
+            for no_play_week_title in no_play_weeks_after:
+                parts.append(self.no_play_week_row(no_play_week_title))
+                parts.append(self.spacer_row())
+            parts.append(self.court_headers_row())
+            parts.append('  <tr class="spacer">\n')
+            parts.append('    <td colspan="26" class="tba_row">SCHEDULE TO BE ANNOUNCED SOON</div></td>\n')
+            parts.append('  </tr>\n\n')
         else:
-            return 'unknown'
+            time_cls_name = 'changed' if week_sked.start_time_changed else 'time'
+            row_num = 1  # the week title row is row 0
+            for time_slot in week_sked.time_slots:
+                parts.append('  <tr class="games">\n')
+                parts.append('    <td class="' + time_cls_name + '">' + time_slot + '</td>\n\n')
+                ts_sked = week_sked.time_slot_skeds[time_slot]
+                cell_num = 1  # the time is cell 0
+                for court in self.court_titles:
+                    game = ts_sked.time_slot_games[court]
+                    updated = ' updated' if (time_slot, court) in week_sked.updated_games else ''
+                    if game.is_skills_clinic:
+                        parts.append('    <td colspan="5" class="skills_clinic' + updated + '">' + game.skills_clinic_title + '</td>\n\n')
+                        team_index.setdefault('SKILLS_CLINIC', []).append([week_num, row_num, cell_num, INDEX_SPECIAL])
+                        cell_num += 1
+                    elif game.is_open_play:
+                        parts.append('    <td colspan="5" class="open_play' + updated + '">' + game.open_play_title + '</td>\n\n')
+                        team_index.setdefault('OPEN_PLAY', []).append([week_num, row_num, cell_num, INDEX_SPECIAL])
+                        cell_num += 1
+                    else:
+                        team_div = self.get_team_division(game.team_1) + updated
+                        parts.append('    <td class="team1 ' + team_div + '">' + game.team_1 + '</td>\n'
+                                     '    <td class="vs ' + team_div + '">vs</td>\n'
+                                     '    <td class="team2 ' + team_div + '">' + game.team_2 + '</td>\n'
+                                     '    <td class="ref ' + team_div + '">ref:</td>\n'
+                                     '    <td class="team_ref ' + team_div + '">' + game.ref_team + '</td>\n\n')
+                        team_index.setdefault(game.team_1, []).append([week_num, row_num, cell_num, INDEX_TEAM_1])
+                        team_index.setdefault(game.team_2, []).append([week_num, row_num, cell_num + 2, INDEX_TEAM_2])
+                        if game.ref_team:
+                            team_index.setdefault(game.ref_team, []).append([week_num, row_num, cell_num + 4, INDEX_REF])
+                        cell_num += 5
+                row_num += 1
+            # Add the row showing bye teams for this week (if there are any)
+            if len(week_sked.bye_week_teams) > 0:
+                parts.append('  <tr class="byes">\n')
+                parts.append('    <td class="bye_week">Bye Week</td>\n')
+                for cell_num, bye_team in enumerate(week_sked.bye_week_teams, start=1):
+                    team_div = self.get_team_division(bye_team)
+                    if bye_team in week_sked.updated_byes:
+                        team_div += ' updated'
+                    parts.append('    <td colspan="2" class="bye ' + team_div + '">' + bye_team + '</td>\n')
+                    team_index.setdefault(bye_team, []).append([week_num, row_num, cell_num, INDEX_BYE])
+                remaining_colspan = 25 - len(week_sked.bye_week_teams)
+                parts.append('    <td colspan="' + str(remaining_colspan) + '" class="empty_row"></td>\n')
+                parts.append('  </tr>\n\n')
+            # Add a spacer row after each week
+            if len(week_sked.time_slots) > 0:
+                parts.append(self.spacer_row())
+        parts.append('</tbody>\n')
+        return ''.join(parts)
+
+    def render_table(self):
+        # Returns the html for the schedule table and the team index for the filter script
+        parts = ['<table id="myTable">\n', '<tbody>\n', self.court_headers_row(), self.spacer_row(), '</tbody>\n']
+        team_index = {}
+        no_play_weeks_by_prev_week = self.get_no_play_weeks_by_prev_week()
+        prev_week_title = ''
+        for week_num, week_title in enumerate(self.week_titles):
+            # First check to see if we need to write one of the no-play week rows
+            for no_play_week_title in no_play_weeks_by_prev_week.get(prev_week_title, []):
+                parts.append(self.no_play_week_block(no_play_week_title))
+            prev_week_title = week_title
+            # TBA weeks (e.g. playoffs) show the no-play weeks that come after them inside their own block
+            no_play_weeks_after = []
+            if self.weekly_skeds[week_title].is_tba and week_title in no_play_weeks_by_prev_week:
+                no_play_weeks_after = no_play_weeks_by_prev_week[week_title]
+                prev_week_title = None  # so these don't get written a second time
+            parts.append(self.render_week(week_num, week_title, no_play_weeks_after, team_index))
+        # Check if there is one last no-play-week at the end
+        for no_play_week_title in no_play_weeks_by_prev_week.get(prev_week_title, []):
+            parts.append(self.no_play_week_block(no_play_week_title))
+        parts.append('</table>')
+        return ''.join(parts), team_index
 
-    def add_no_play_week(self, outfile, no_play_week_title):
-        outfile.write('  <tr class="week">\n')
-        outfile.write('    <td colspan="26" class="no_play_week">' + no_play_week_title + '</td>\n')
-        outfile.write('  </tr>\n\n')
+    def render_html(self, asset_urls=None):
+        table, team_index = self.render_table()
+        page_script = 'const teamIndex = ' + json.dumps(team_index, separators=(',', ':')) + ';\n'
+        return self.render_page(table, ['filter_funcs.js'], page_script, asset_urls)
 
     def generate_html(self, outfile):
-        # write initial header lines
-        outfile.write('<!DOCTYPE html>\n')
-        outfile.write('<html>\n')
-        outfile.write('<head>\n')
-        outfile.write('<meta name="viewport" content="width=device-width, initial-scale=1">\n')
-        outfile.write('<meta http-equiv="content-type" content="text/html; charset=utf-8" />\n')
-        outfile.write('<style>\n')
-        # Add styles from styles.css
-        with open('style.css', 'r') as css_file:
-            styles = css_file.read()
-        outfile.write(styles + '\n')
-        # write the remainder of the header lines
-        outfile.write('</style>\n')
-        outfile.write('</head>\n')
-
-        # Next we start the html body
-        outfile.write('<body>\n\n')
-
-        # Start by writing the title
-        outfile.write('<h2>' + self.title + '</h2>\n\n')
-
-        # Next we create the drop down for team selection
-        outfile.write('<p>Select a team to filter the schedule:&nbsp;&nbsp;\n')
-        outfile.write('  <select id="firstTeamSelect" onchange="handleFirstTeamSelectChange()" autocomplete="off">\n')
-        outfile.write('    <option selected value="SHOWALL"> -- ALL TEAMS -- </option>\n')
-        for i in range(1, self.num_rec_teams + 1):
-            outfile.write('    <option class="rec">REC' + str(i) + '</option>\n')
-        for i in range(1, self.num_int_teams + 1):
-            outfile.write('    <option class="int">INT' + str(i) + '</option>\n')
-        for i in range(1, self.num_com_teams + 1):
-            outfile.write('    <option class="com">COM' + str(i) + '</option>\n')
-        for i in range(1, self.num_pow_teams + 1):
-            outfile.write('    <option class="pow">POW' + str(i) + '</option>\n')
-        for i in range(1, self.num_pow_plus_teams + 1):
-            outfile.write('    <option class="pow_plus">P+' + str(i) + '</option>\n')
-        outfile.write('  </select>\n')
-        outfile.write('</p>\n')
-
-        # Next we create the optional filters div
-        outfile.write('<div class="optional_filters_div" id="optional_filters_div">\n')
-        outfile.write('  <p class="optional_filters_hedaer">Optional Filters:</p>\n')
-        outfile.write('  <div class="optional_filters_sub_div_left">\n')
-        outfile.write('    <p>\n')
-        outfile.write('      <label for="secondTeamSelect">Select Second Team:&nbsp;&nbsp;</label>\n')
-        outfile.write('      <select id="secondTeamSelect" onchange="handleOptionalFiltersChange()" autocomplete="off" disabled>\n')
-        outfile.write('	     </select>\n')
-        outfile.write('    </p>\n')
-        outfile.write('  </div>\n')
-        outfile.write('  <div class="optional_filters_sub_div_right">\n')
-        outfile.write('    <label for="showOpenPlay">Show <span class="open_play">OPEN PLAY</span> slots:&nbsp;&nbsp;</label>\n')
-        outfile.write('    <input id="showOpenPlay" type="checkbox" onchange="handleOptionalFiltersChange()" disabled>\n')
-        outfile.write('    <br /><br />\n')
-        outfile.write('    <label for="showSkillsClinic">Show <span class="skills_clinic">SKILLS CLINIC</span> slots:&nbsp;&nbsp;</label>\n')
-        outfile.write('    <input id="showSkillsClinic" type="checkbox" onchange="handleOptionalFiltersChange()" disabled>\n')
-        outfile.write('  </div>\n')
-        outfile.write('</div>\n')
-        outfile.write('<br /><br />\n\n')
-
-        # Next is the table for the actual schedule
-        outfile.write('<table id="myTable">\n')
-        # First table row is the court titles
-        self.write_court_headers(outfile)
-        self.add_spacer_row(outfile)
-
-        # Now we can write the rows for each week in the schedule
+        # The whole page is built in memory and written in one go
+        outfile.write(self.render_html())
+
+    def get_game_data(self, game):
+        # Regular games are [team 1, team 2, ref team] and open play/skills clinic slots are [class name, title]
+        if game.is_skills_clinic:
+            return ['skills_clinic', game.skills_clinic_title]
+        elif game.is_open_play:
+            return ['open_play', game.open_play_title]
+        return [game.team_1, game.team_2, game.ref_team]
+
+    def get_schedule_data(self):
+        # Compact version of the parsed schedule that render_funcs.js turns back into the same table
+        # that generate_html writes (no-play weeks are placed the same way generate_html places them)
+        weeks = []
+        no_play_weeks_by_prev_week = self.get_no_play_weeks_by_prev_week()
         prev_week_title = ''
         for week_title in self.week_titles:
-            # First check to see if we need to write one of the no-play week rows
-            for npw in self.no_play_weeks:
-                if npw['prev_week'] == prev_week_title:
-                    self.add_no_play_week(outfile, npw['title'])
-                    self.add_spacer_row(outfile)
-            prev_week_title = week_title
-            # Write the week title row
             week_sked = self.weekly_skeds[week_title]
-            outfile.write('  <tr class="week">\n')
-            outfile.write('    <td></td>\n')
-            if week_sked.is_tba:
-                outfile.write('    <td colspan="5" class="playoff_week">' + week_title + '</td>\n')
-                outfile.write('	   <td colspan="20"></td>\n')
-            else:
-                outfile.write('    <td colspan="25" class="week_row">' + week_title + '</td>\n')
-            outfile.write('  </tr>\n')
-            # Write rows for each timeslot in this week's schedule
+            week_data = {'title': week_title}
+            if prev_week_title in no_play_weeks_by_prev_week:
+                week_data['no_play_before'] = no_play_weeks_by_prev_week[prev_week_title]
+            prev_week_title = week_title
             if week_sked.is_tba:
-                # First check if there is a "no-play-week" title for this TBA week and add that here
-                for npw in self.no_play_weeks:
-                    if npw['prev_week'] == week_title:
-                        self.add_no_play_week(outfile, npw['title'])
-                        self.add_spacer_row(outfile)
-                        prev_week_title = ''  # reset prev week to avoid writing this twice
-                self.write_court_headers(outfile)
-                outfile.write('  <tr class="spacer">\n')
-                outfile.write('    <td colspan="26" class="tba_row">SCHEDULE TO BE ANNOUNCED SOON</div></td>\n')
-                outfile.write('  </tr>\n\n')
+                week_data['tba'] = 1
+                if week_title in no_play_weeks_by_prev_week:
+                    week_data['no_play_after'] = no_play_weeks_by_prev_week[week_title]
+                    prev_week_title = None  # same as render_table, to avoid writing these twice
             else:
+                if week_sked.start_time_changed:
+                    week_data['changed'] = 1
+                week_data['slots'] = []
                 for time_slot in week_sked.time_slots:
-                    outfile.write('  <tr>\n')
-                    if week_sked.start_time_changed:
-                        outfile.write('    <td class="changed">' + time_slot + '</td>\n\n')
-                    else:
-                        outfile.write('    <td class="time">' + time_slot + '</td>\n\n')
                     ts_sked = week_sked.time_slot_skeds[time_slot]
-                    for court in self.court_titles:
-                        game = ts_sked.time_slot_games[court]
-                        if game.is_skills_clinic:
-                            outfile.write('    <td colspan="5" class="skills_clinic">' + game.skills_clinic_title + '</td>\n\n')
-                        elif game.is_open_play:
-                            outfile.write('    <td colspan="5" class="open_play">' + game.open_play_title + '</td>\n\n')
-                        else:
-                            team_div = self.get_team_division(game.team_1)
-                            outfile.write('    <td class="team1 ' + team_div + '">' + game.team_1 + '</td>\n')
-                            outfile.write('    <td class="vs ' + team_div + '">vs</td>\n')
-                            outfile.write('    <td class="team2 ' + team_div + '">' + game.team_2 + '</td>\n')
-                            outfile.write('    <td class="ref ' + team_div + '">ref:</td>\n')
-                            outfile.write('    <td class="team_ref ' + team_div + '">' + game.ref_team + '</td>\n\n')
-                # Add the row showing bye teams for this week (if there are any)
-                if len(week_sked.bye_week_teams) > 0:
-                    outfile.write('  <tr>\n')
-                    outfile.write('    <td class="bye_week">Bye Week</td>\n')
-                    for bye_team in week_sked.bye_week_teams:
-                        team_div = self.get_team_division(bye_team)
-                        outfile.write('    <td colspan="2" class="bye ' + team_div + '">' + bye_team + '</td>\n')
-                    remaining_colspan = 25 - len(week_sked.bye_week_teams)
-                    outfile.write('    <td colspan="' + str(remaining_colspan) + '" class="empty_row"></td>\n')
-                    outfile.write('  </tr>\n\n')
-                # Add a spacer row after each week
-                if len(week_sked.time_slots) > 0:
-                    self.add_spacer_row(outfile)
+                    week_data['slots'].append([time_slot] + [self.get_game_data(ts_sked.time_slot_games[court]) for court in self.court_titles])
+                if week_sked.bye_week_teams:
+                    week_data['byes'] = week_sked.bye_week_teams
+                # Changes since the previous export, as [time slot number, court number] and bye team names
+                if week_sked.updated_games:
+                    week_data['updated'] = sorted([week_sked.time_slots.index(time_slot), self.court_titles.index(court)]
+                                                  for time_slot, court in week_sked.updated_games)
+                if week_sked.updated_byes:
+                    week_data['updated_byes'] = sorted(week_sked.updated_byes)
+            weeks.append(week_data)
+        return {
+            'courts': self.court_titles,
+            'weeks': weeks,
+            'no_play_end': no_play_weeks_by_prev_week.get(prev_week_title, []),
+        }
 
-        # Check if there is one last no-play-week at the end
-        for npw in self.no_play_weeks:
-            if npw['prev_week'] == prev_week_title:
-                self.add_no_play_week(outfile, npw['title'])
-                self.add_spacer_row(outfile)
-
-        # Finally we can close the table and add the scripts
-        outfile.write('</table>\n')
-        outfile.write('<br /><br /><br />\n\n')
-        outfile.write('<script>\n')
-
-        # We need to update the team counts before writing the script
-        with open('filter_funcs.js', 'r') as js_file:
-            js_lines = js_file.readlines()
-        js_lines[2] = '    "REC": ' + str(self.num_rec_teams) + ',\n'
-        js_lines[3] = '    "INT": ' + str(self.num_int_teams) + ',\n'
-        js_lines[4] = '    "COM": ' + str(self.num_com_teams) + ',\n'
-        js_lines[5] = '    "POW": ' + str(self.num_pow_teams) + ',\n'
-        js_lines[6] = '    "P+": ' + str(self.num_pow_plus_teams) + '\n'
-        outfile.writelines(js_lines)
-
-        # Close out the html tags and we are done!
-        outfile.write('</script>\n\n')
-        outfile.write('</body>\n')
-        outfile.write('</html>\n')
+    def render_compact_html(self, asset_urls=None):
+        # Same page as render_html but the table is built in the browser from the schedule data
+        schedule_data = json.dumps(self.get_schedule_data(), separators=(',', ':'))
+        page_script = 'const teamIndex = renderSchedule(document.getElementById("myTable"), ' + schedule_data + ');\n'
+        return self.render_page('<table id="myTable"></table>', ['filter_funcs.js', 'render_funcs.js'], page_script, asset_urls)
+
+    def generate_compact_html(self, outfile):
+        outfile.write(self.render_compact_html())
+
+    def get_week_dates(self):
+        # Date of each week from its title and the year in the season title. Weeks without a date in their
+        # title map to None. Seasons that run past the end of December move on to the next year
+        season_name = self.get_season_name()
+        year = int(season_name[1]) if season_name else None
+        week_dates = {}
+        prev_month = 0
+        for week_title in self.week_titles:
+            week_dates[week_title] = None
+            month_day = parse_month_day(week_title)
+            if year is None or month_day is None:
+                continue
+            month, day = month_day
+            if month < prev_month:
+                year += 1
+            prev_month = month
+            try:
+                week_dates[week_title] = datetime.date(year, month, day)
+            except ValueError:
+                pass  # e.g. a typo like 'Feb 30'
+        return week_dates
+
+    def get_week_date_strings(self):
+        # Date of each week in week number order as YYYY-MM-DD (or None), used by the page to collapse past weeks
+        week_dates = self.get_week_dates()
+        return [week_dates[week_title].isoformat() if week_dates[week_title] else None for week_title in self.week_titles]
+
+    def get_team_schedules(self):
+        # Every game, ref duty and bye of each team, collected in a single pass over the season so the
+        # per-team pages and calendars don't each have to walk the whole schedule again. Entries are
+        # (week number, time slot, game, role), with the time slot and game set to None for byes
+        team_schedules = {team: [] for team in self.get_all_teams()}
+        for week_num, week_title in enumerate(self.week_titles):
+            week_sked = self.weekly_skeds[week_title]
+            for time_slot in week_sked.time_slots:
+                for game in week_sked.time_slot_skeds[time_slot].time_slot_games.values():
+                    if game.is_skills_clinic or game.is_open_play:
+                        continue
+                    for team, role in ((game.team_1, TEAM_PLAYS), (game.team_2, TEAM_PLAYS), (game.ref_team, TEAM_REFS)):
+                        if team in team_schedules:
+                            team_schedules[team].append((week_num, time_slot, game, role))
+            for team in week_sked.bye_week_teams:
+                if team in team_schedules:
+                    team_schedules[team].append((week_num, None, None, TEAM_BYE))
+        return team_schedules
+
+    def get_team_filename(self, team_name):
+        # e.g. ('P+3' in fall 2025) -> 'fall-2025-pplus3'
+        return self.get_page_filename()[:-len('.html')] + '-' + team_name.lower().replace('+', 'plus')
+
+    def team_game_row(self, team_name, time_slot, game, time_cls_name):
+        team_div = self.get_team_division(game.team_1)
+
+        def team_cell(cls_name, cell_team):
+            if cell_team == team_name:
+                cls_name += ' highlighted'
+            return '    <td class="' + cls_name + ' ' + team_div + '">' + cell_team + '</td>\n'
+
+        return ('  <tr class="games">\n'
+                '    <td class="' + time_cls_name + '">' + time_slot + '</td>\n'
+                '    <td class="court">' + game.court_name + '</td>\n' +
+                team_cell('team1', game.team_1) +
+                '    <td class="vs ' + team_div + '">vs</td>\n' +
+                team_cell('team2', game.team_2) +
+                '    <td class="ref ' + team_div + '">ref:</td>\n' +
+                team_cell('team_ref', game.ref_team) +
+                '  </tr>\n')
+
+    def render_team_table(self, team_name, team_schedule):
+        # Every week of the season is listed (so byes, TBA and no-play weeks still show up) but only with the
+        # team's own games and ref duties
+        entries_by_week = {}
+        for entry in team_schedule:
+            entries_by_week.setdefault(entry[0], []).append(entry)
+        parts = ['<table id="myTable" class="team_schedule">\n', '<tbody>\n', '  <tr class="header">\n', '    <th>Time</th>\n',
+                 '    <th>Court</th>\n', '    <th colspan="5">Game</th>\n', '  </tr>\n', '</tbody>\n']
+        no_play_weeks_by_prev_week = self.get_no_play_weeks_by_prev_week()
+        prev_week_title = ''
+        for week_num, week_title in enumerate(self.week_titles):
+            for no_play_week_title in no_play_weeks_by_prev_week.get(prev_week_title, []):
+                parts.append('<tbody>\n  <tr class="week">\n    <td colspan="7" class="no_play_week">' + no_play_week_title + '</td>\n  </tr>\n</tbody>\n')
+            prev_week_title = week_title
+            week_sked = self.weekly_skeds[week_title]
+            week_cls_name = 'playoff_week' if week_sked.is_tba else 'week_row'
+            parts.append('<tbody>\n  <tr class="week">\n    <td colspan="7" class="' + week_cls_name + '">' + week_title + '</td>\n  </tr>\n')
+            if week_sked.is_tba:
+                parts.append('  <tr>\n    <td colspan="7" class="tba_row">SCHEDULE TO BE ANNOUNCED SOON</td>\n  </tr>\n')
+            time_cls_name = 'changed' if week_sked.start_time_changed else 'time'
+            for _, time_slot, game, role in entries_by_week.get(week_num, []):
+                if role == TEAM_BYE:
+                    parts.append('  <tr class="byes">\n'
+                                 '    <td class="bye_week">Bye Week</td>\n'
+                                 '    <td colspan="6" class="bye ' + self.get_team_division(team_name) + '">' + team_name + '</td>\n'
+                                 '  </tr>\n')
+                else:
+                    parts.append(self.team_game_row(team_name, time_slot, game, time_cls_name))
+            parts.append('</tbody>\n')
+        for no_play_week_title in no_play_weeks_by_prev_week.get(prev_week_title, []):
+            parts.append('<tbody>\n  <tr class="week">\n    <td colspan="7" class="no_play_week">' + no_play_week_title + '</td>\n  </tr>\n</tbody>\n')
+        parts.append('</table>')
+        return ''.join(parts)
+
+    def render_team_page(self, team_name, team_schedule, season_page, calendar, asset_urls=None):
+        return string.Template(load_assets()['team_page_template.html']).substitute(
+            styles=style_tag(asset_urls),
+            team=team_name,
+            title=self.title,
+            season_page=season_page,
+            calendar=calendar,
+            table=self.render_team_table(team_name, team_schedule),
+        )
+
+    def team_calendar_event(self, team_name, uid_prefix, week_date, time_slot, game, role):
+        # Lines of the iCalendar event for one entry of a team's schedule (none if the time slot isn't a time).
+        # The event is stamped with the date of the week instead of the build time so that rebuilding an
+        # unchanged schedule writes exactly the same file
+        date_str = week_date.strftime('%Y%m%d')
+        if role == TEAM_BYE:
+            return ['BEGIN:VEVENT',
+                    'UID:' + uid_prefix + '-' + date_str + '-bye@scvl-schedules',
+                    'DTSTAMP:' + date_str + 'T000000Z',
+                    'DTSTART;VALUE=DATE:' + date_str,
+                    'DTEND;VALUE=DATE:' + (week_date + datetime.timedelta(days=1)).strftime('%Y%m%d'),
+                    'SUMMARY:' + ics_escape(team_name + ' bye week'),
+                    'TRANSP:TRANSPARENT',
+                    'END:VEVENT']
+        start_time = parse_time_slot(time_slot)
+        if start_time is None:
+            return []
+        start = datetime.datetime.combine(week_date, start_time)
+        court_id = re.sub(r'[^a-z0-9]+', '', game.court_name.lower())
+        lines = ['BEGIN:VEVENT',
+                 'UID:' + uid_prefix + '-' + start.strftime('%Y%m%dT%H%M%S') + '-' + court_id + '-' + role + '@scvl-schedules',
+                 'DTSTAMP:' + date_str + 'T000000Z',
+                 'DTSTART:' + start.strftime('%Y%m%dT%H%M%S'),
+                 'DTEND:' + (start + GAME_LENGTH).strftime('%Y%m%dT%H%M%S')]
+        if role == TEAM_PLAYS:
+            opponent = game.team_2 if game.team_1 == team_name else game.team_1
+            lines.append('SUMMARY:' + ics_escape(team_name + ' vs ' + opponent))
+            if game.ref_team:
+                lines.append('DESCRIPTION:' + ics_escape('Ref: ' + game.ref_team))
+        else:
+            lines.append('SUMMARY:' + ics_escape(team_name + ' refs ' + game.team_1 + ' vs ' + game.team_2))
+        lines.append('LOCATION:' + ics_escape(game.court_name))
+        lines.append('END:VEVENT')
+        return lines
+
+    def render_team_calendar(self, team_name, team_schedule, week_dates):
+        # iCalendar feed of a team's games, ref duties and byes. Times are left without a time zone so calendar
+        # apps show them at the local time printed on the schedule. Weeks without a date in their title are left out
+        uid_prefix = self.get_team_filename(team_name)
+        lines = ['BEGIN:VCALENDAR',
+                 'VERSION:2.0',
+                 'PRODID:-//SCVL//Schedule Generator//EN',
+                 'CALSCALE:GREGORIAN',
+                 'METHOD:PUBLISH',
+                 'X-WR-CALNAME:' + ics_escape(team_name + ' - ' + self.get_index_title())]
+        for week_num, time_slot, game, role in team_schedule:
+            week_date = week_dates[self.week_titles[week_num]]
+            if week_date is not None:
+                lines.extend(self.team_calendar_event(team_name, uid_prefix, week_date, time_slot, game, role))
+        lines.append('END:VCALENDAR')
+        return ''.join(ics_fold(line) + '\r\n' for line in lines)
 
     def print_extracted_sked(self):
         print('TITLE: ', self.title)
@@ -343,27 +763,10 @@ class Schedule:
         print('  P+: ', self.num_pow_plus_teams)
         print('=======================================')
 
-        # Create a set of all team names to use for verifying bye teams list
-        all_teams = set()
-        for i in range(1, self.num_rec_teams + 1):
-            all_teams.add(f"REC{i}")
-        for i in range(1, self.num_int_teams + 1):
-            all_teams.add(f"INT{i}")
-        for i in range(1, self.num_com_teams + 1):
-            all_teams.add(f"COM{i}")
-        for i in range(1, self.num_pow_teams + 1):
-            all_teams.add(f"POW{i}")
-        for i in range(1, self.num_pow_plus_teams + 1):
-            all_teams.add(f"P+{i}")
-            
         for wk, wk_sked in self.weekly_skeds.items():
             print(wk, ' | BYE TEAMS: ', wk_sked.bye_week_teams)
-            wk_teams = set()
-            wk_playing_teams = set()
-            wk_reffing_teams = set()
             for ts, ts_sked in wk_sked.time_slot_skeds.items():
                 print(ts)
-                time_slot_teams = set()
                 for ct, game in ts_sked.time_slot_games.items():
                     if game.is_skills_clinic:
                         print(ct, ': ', game.skills_clinic_title)
@@ -371,61 +774,625 @@ class Schedule:
                         print(ct, ': ', game.open_play_title)
                     else:
                         print(ct, ': ', game.team_1, ' vs ', game.team_2, ' | ref: ', game.ref_team)
-                        wk_teams.update([game.team_1, game.team_2, game.ref_team])
-                        wk_playing_teams.update([game.team_1, game.team_2])
-                        wk_reffing_teams.add(game.ref_team)
-                        if game.team_1 in time_slot_teams:
-                            print('######## CONFLICT DETECTED: Duplicate team: ', game.team_1)
-                        else:
-                            time_slot_teams.add(game.team_1)
-                        if game.team_2 in time_slot_teams:
-                            print('######## CONFLICT DETECTED: Duplicate team: ', game.team_2)
-                        else:
-                            time_slot_teams.add(game.team_2)
-                        if game.ref_team in time_slot_teams:
-                            print('######## CONFLICT DETECTED: Duplicate team: ', game.ref_team)
-                        else:
-                            time_slot_teams.add(game.ref_team)
-            if len(wk_sked.time_slot_skeds) > 0:
-                # verify that the bye teams are correct
-                calculated_wk_bye_teams = all_teams - wk_teams
-                if calculated_wk_bye_teams != set(wk_sked.bye_week_teams):
-                    missing_bye_week_teams = calculated_wk_bye_teams - set(wk_sked.bye_week_teams)
-                    extra_bye_week_teams = set(wk_sked.bye_week_teams) - calculated_wk_bye_teams
-                    print('######## INVALID BYE WEEK TEAMS DETECTED! Extra teams: ', extra_bye_week_teams, ' | Missing teams: ', missing_bye_week_teams)
-                # check if any teams are only reffing and not playing
-                wk_reffing_only_teams = set()
-                for reffing_team in wk_reffing_teams:
-                    if reffing_team not in wk_playing_teams:
-                        wk_reffing_only_teams.add(reffing_team)
-                if len(wk_reffing_only_teams) > 0:
-                    print('######## FOUND TEAMS ONLY REFFING: ', wk_reffing_only_teams)
+        print('=======================================')
 
+        # Finally run all of the schedule checks (conflicts, bye teams, etc.) and print any problems found
+        from validator import validate_schedule
+        for issue in validate_schedule(self).issues:
+            print('########', issue['severity'].upper() + ':', issue['message'])
 
-def main():
-    # Get the input csv filename from the command line
-    parser = argparse.ArgumentParser()
-    parser.add_argument('filename')
-    parser.add_argument('-s', '--start-col', help='first column in csv that is not blank', default=0, type=int)
-    parser.add_argument('-d', '--debug', help='print debugging output', action='store_true')
-    args = parser.parse_args()
 
-    # Create a schedule object to use for reading the input csv and generating the schedule html
+@functools.lru_cache(maxsize=None)
+def load_assets():
+    # The styles, scripts and page template are the same for every season so only read them once per process
+    assets = {}
+    for asset_filename in TEMPLATE_FILENAMES:
+        with open(os.path.join(ASSETS_DIR, asset_filename), 'r') as asset_file:
+            assets[asset_filename] = asset_file.read()
+    return assets
+
+
+def style_tag(asset_urls=None):
+    if asset_urls:
+        return '<link rel="stylesheet" href="' + asset_urls['style.css'] + '">'
+    return '<style>\n' + load_assets()['style.css'] + '\n</style>'
+
+
+def script_tags(script_filenames, asset_urls=None):
+    # Tags loading the shared copies of the scripts (nothing if the scripts are included in the page)
+    if not asset_urls:
+        return ''
+    return ''.join('<script src="' + asset_urls[f] + '"></script>\n' for f in script_filenames)
+
+
+def hash_file(filename):
+    with open(filename, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def get_assets_hash():
+    # Combined hash of everything (besides the csv) that affects the generated html
+    assets_hash = hashlib.sha256()
+    for asset_filename in ASSET_FILENAMES:
+        assets_hash.update(hash_file(os.path.join(ASSETS_DIR, asset_filename)).encode())
+    return assets_hash.hexdigest()
+
+
+def load_manifest(output_dir):
+    manifest_filename = os.path.join(output_dir, MANIFEST_FILENAME)
+    if os.path.exists(manifest_filename):
+        try:
+            with open(manifest_filename, 'r') as manifest_file:
+                manifest = json.load(manifest_file)
+            if manifest.get('assets') == get_assets_hash():
+                return manifest
+        except (ValueError, OSError):
+            pass  # treat a corrupt manifest the same as a missing one
+    # No (valid) manifest or the assets have changed, so everything needs to be rebuilt
+    return {'assets': get_assets_hash(), 'seasons': {}}
+
+
+def save_manifest(output_dir, manifest):
+    write_file_atomic(os.path.join(output_dir, MANIFEST_FILENAME), json.dumps(manifest, indent=2, sort_keys=True))
+
+
+@functools.lru_cache(maxsize=None)
+def get_umask():
+    # The only way to read the umask is to change it, so set it straight back
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def write_file_atomic(filename, data, newline=None):
+    # Write to a temp file next to the destination and then rename it, so anything serving or reading
+    # the file (e.g. a local web server) never sees a half written file. data can be text or bytes
+    output_dir = os.path.dirname(os.path.abspath(filename))
+    mode = 'wb' if isinstance(data, bytes) else 'w'
+    with tempfile.NamedTemporaryFile(mode, dir=output_dir, prefix='.tmp-', newline=newline, delete=False) as tmpfile:
+        tmpfile.write(data)
+    try:
+        # Temp files are only readable by their owner, so give it the permissions a regular open() would
+        os.chmod(tmpfile.name, 0o666 & ~get_umask())
+        os.replace(tmpfile.name, filename)
+    except OSError:
+        os.remove(tmpfile.name)
+        raise
+
+
+def write_output(filename, text, precompress=False, newline=None):
+    # Writes a generated file and, when precompressing, .gz and .br (if brotli is installed) versions of it that
+    # a web server can send as is. Returns the size of each version written
+    write_file_atomic(filename, text, newline)
+    sizes = {'raw': os.path.getsize(filename)}
+    if precompress:
+        with open(filename, 'rb') as output_file:
+            data = output_file.read()
+        sizes = {'raw': len(data)}
+        # mtime=0 so that an unchanged file always compresses to exactly the same bytes
+        sizes['gz'] = write_compressed(filename + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            sizes['br'] = write_compressed(filename + '.br', brotli.compress(data))
+    # Don't leave behind compressed versions of an older build of the file
+    for extension in ('.gz', '.br'):
+        if extension[1:] not in sizes and os.path.exists(filename + extension):
+            os.remove(filename + extension)
+    return sizes
+
+
+def write_compressed(filename, data):
+    write_file_atomic(filename, data)
+    return len(data)
+
+
+def get_precompress_formats(precompress):
+    # Kept in the build manifest, so that installing brotli later rebuilds everything with .br files too
+    if not precompress:
+        return []
+    return ['gz', 'br'] if brotli is not None else ['gz']
+
+
+def add_sizes(total_sizes, sizes):
+    # Adds the sizes of a file written by write_output (or the totals of several files) to the totals
+    if sizes:
+        total_sizes['files'] = total_sizes.get('files', 0) + sizes.get('files', 1)
+        for key, size in sizes.items():
+            if key != 'files':
+                total_sizes[key] = total_sizes.get(key, 0) + size
+    return total_sizes
+
+
+def get_shared_asset_filenames(compact):
+    # Only compact pages need render_funcs.js
+    return [asset_filename for asset_filename in SHARED_ASSET_FILENAMES if compact or asset_filename != 'render_funcs.js']
+
+
+def write_shared_assets(output_dir, compact=False, precompress=False):
+    # Writes the styles and scripts the pages use once, named after their content (e.g. style.1a2b3c4d5e.css)
+    # so browsers can keep them cached for good and any change to them gets a new name. Returns the url of
+    # each one (relative to the output folder) and the sizes of the files written
+    assets_dir = os.path.join(output_dir, SHARED_ASSETS_DIR)
+    os.makedirs(assets_dir, exist_ok=True)
+    asset_urls = {}
+    total_sizes = {}
+    for asset_filename in get_shared_asset_filenames(compact):
+        content = load_assets()[asset_filename]
+        name, extension = os.path.splitext(asset_filename)
+        hashed_filename = name + '.' + hashlib.sha256(content.encode()).hexdigest()[:10] + extension
+        add_sizes(total_sizes, write_output(os.path.join(assets_dir, hashed_filename), content, precompress))
+        asset_urls[asset_filename] = SHARED_ASSETS_DIR + '/' + hashed_filename
+    return asset_urls, total_sizes
+
+
+def render_season(sked, compact, asset_urls=None):
+    if compact:
+        return sked.render_compact_html(asset_urls)
+    return sked.render_html(asset_urls)
+
+
+def write_team_pages(sked, output_dir, season_page, asset_urls=None, precompress=False):
+    # A small page and a calendar for every team, all built from the same team schedules
+    teams_dir = os.path.join(output_dir, TEAMS_DIR)
+    os.makedirs(teams_dir, exist_ok=True)
+    if asset_urls:
+        # The team pages are one folder down from the shared assets
+        asset_urls = {asset_filename: '../' + url for asset_filename, url in asset_urls.items()}
+    week_dates = sked.get_week_dates()
+    total_sizes = {}
+    for team_name, team_schedule in sked.get_team_schedules().items():
+        team_filename = sked.get_team_filename(team_name)
+        team_page = sked.render_team_page(team_name, team_schedule, '../' + season_page, team_filename + '.ics', asset_urls)
+        add_sizes(total_sizes, write_output(os.path.join(teams_dir, team_filename + '.html'), team_page, precompress))
+        # iCalendar files always use \r\n line endings, so they're written as is on every platform
+        calendar = sked.render_team_calendar(team_name, team_schedule, week_dates)
+        add_sizes(total_sizes, write_output(os.path.join(teams_dir, team_filename + '.ics'), calendar, precompress, newline=''))
+    return total_sizes
+
+
+def is_up_to_date(manifest, csv_key, csv_hash, options, output_dir):
+    # options holds any command line settings that change the output (e.g. compact mode)
+    entry = manifest['seasons'].get(csv_key)
+    if not entry:
+        return False
+    if entry['csv_hash'] != csv_hash or entry['options'] != options:
+        return False
+    # Also rebuild if someone deleted the output file
+    return os.path.exists(os.path.join(output_dir, entry['html']))
+
+
+def get_page_sizes(sked):
+    # Size of the page in both output modes (raw and gzipped, since that's what actually gets transferred)
+    sizes = {}
+    for mode, render in (('full', sked.render_html), ('compact', sked.render_compact_html)):
+        page_bytes = render().encode()
+        sizes[mode] = (len(page_bytes), len(gzip.compress(page_bytes)))
+    return sizes
+
+
+def print_size_report(html_filename, sizes):
+    full_size, full_gz_size = sizes['full']
+    compact_size, compact_gz_size = sizes['compact']
+    print(f'{html_filename}: full {full_size:,} bytes ({full_gz_size:,} gzipped) | '
+          f'compact {compact_size:,} bytes ({compact_gz_size:,} gzipped) | '
+          f'{100 - 100 * compact_size / full_size:.0f}% smaller ({100 - 100 * compact_gz_size / full_gz_size:.0f}% gzipped)')
+
+
+def print_compression_report(name, total_sizes):
+    raw_size, gz_size = total_sizes['raw'], total_sizes['gz']
+    line = (f'{name}: {total_sizes["files"]} file(s), {raw_size:,} bytes -> {gz_size:,} gzipped '
+            f'({100 - 100 * gz_size / raw_size:.0f}% saved)')
+    if 'br' in total_sizes:
+        line += f', {total_sizes["br"]:,} brotli ({100 - 100 * total_sizes["br"] / raw_size:.0f}% saved)'
+    print(line)
+
+
+def print_shared_assets_report(assets_sizes, num_pages):
+    # Every file written to the shared assets folder is one that each season page would otherwise include
+    assets_size = assets_sizes['raw']
+    print(f'Shared assets: {assets_sizes["files"]} file(s), {assets_size:,} bytes written once to {SHARED_ASSETS_DIR}/ '
+          f'instead of into each of the {num_pages} season page(s) built ({assets_size * num_pages:,} bytes saved)')
+
+
+class BuildStats:
+    # Wall time of each phase of a build (and the memory it allocated, while tracemalloc is tracing) plus
+    # counts of what was built. Kept as plain dicts so it can be sent back from the worker processes
+    def __init__(self):
+        self.phases = {}
+        self.counts = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            phase = self.phases.setdefault(name, {'seconds': 0.0})
+            phase['seconds'] += time.perf_counter() - start_time
+            if tracing:
+                # Allocated is what's still held at the end of the phase, peak is the most held at once during it
+                current_memory, peak_memory = tracemalloc.get_traced_memory()
+                phase['allocated_bytes'] = phase.get('allocated_bytes', 0) + current_memory - start_memory
+                phase['peak_bytes'] = max(phase.get('peak_bytes', 0), peak_memory - start_memory)
+
+    def count(self, name, value):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def to_dict(self):
+        return {'phases': self.phases, 'counts': self.counts}
+
+
+def get_season_stats(stats, sked, csv_filename, html_filename, compressed_sizes):
+    # The stats of a season build along with counts of what's in the season and what was written for it
+    stats.count('weeks', len(sked.week_titles))
+    stats.count('teams', len(sked.get_all_teams()))
+    for week_sked in sked.weekly_skeds.values():
+        stats.count('time_slots', len(week_sked.time_slots))
+        for time_slot_sked in week_sked.time_slot_skeds.values():
+            stats.count('games', sum(1 for game in time_slot_sked.time_slot_games.values()
+                                     if not (game.is_skills_clinic or game.is_open_play)))
+    stats.count('files_written', compressed_sizes['files'])
+    stats.count('bytes_written', sum(size for key, size in compressed_sizes.items() if key != 'files'))
+    return dict(csv=csv_filename, html=html_filename, **stats.to_dict())
+
+
+def read_schedule(csv_filename, start_col=None, debug=False, stats=None):
+    # Reads and parses a season csv. The rows are parsed as they're read, so the two are timed together
+    stats = stats or BuildStats()
     sked = Schedule()
+    with stats.phase('parse'):
+        with open(csv_filename, newline='') as csvfile:
+            csv_reader = csv.reader(csvfile, delimiter=',', quotechar='"')
+            sked.parse_rows(csv_reader, start_col, debug)
+    stats.count('rows', sked.num_rows)
+    return sked
+
+
+def find_csv_files(paths):
+    # The csv files given, with any folder replaced by the csv files in it (sorted by name)
+    csv_filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            csv_filenames.extend(sorted(os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith('.csv')))
+        else:
+            csv_filenames.append(path)
+    return csv_filenames
+
+
+def validate_for_stats(sked, stats):
+    # Validation isn't part of a normal build, it's only run to be timed along with everything else
+    from validator import SEVERITY_ERROR, SEVERITY_WARNING, validate_schedule
+    with stats.phase('validate'):
+        result = validate_schedule(sked)
+    stats.count('errors', result.count(SEVERITY_ERROR))
+    stats.count('warnings', result.count(SEVERITY_WARNING))
+
+
+def write_stats(stats_output, seasons_stats, total_seconds):
+    # '-' prints the stats instead of writing them to a file
+    text = json.dumps({'seasons': seasons_stats, 'total_seconds': total_seconds}, indent=2)
+    if stats_output == '-':
+        print(text)
+    else:
+        write_file_atomic(stats_output, text + '\n')
+        print('Wrote build stats to', stats_output)
+
+
+def build_season(csv_filename, output_dir, start_col=None, debug=False, compact=False, size_report=False, team_pages=False,
+                 asset_urls=None, precompress=False, collect_stats=False, stats_memory=False):
+    # Parse a single season csv and write its html page using the season name (e.g. fall-2025.html)
+    stats = BuildStats()
+    # Tracing allocations slows everything down a lot, so it's only on when the memory stats were asked for.
+    # Each worker process starts its own tracing for the allocations of its seasons
+    started_tracing = collect_stats and stats_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    sked = read_schedule(csv_filename, start_col, debug, stats)
+    if debug:
+        sked.print_extracted_sked()
+    if collect_stats:
+        validate_for_stats(sked, stats)
+    html_filename = sked.get_page_filename()
+    with stats.phase('render'):
+        page = render_season(sked, compact, asset_urls)
+    with stats.phase('write'):
+        compressed_sizes = add_sizes({}, write_output(os.path.join(output_dir, html_filename), page, precompress))
+    if team_pages:
+        with stats.phase('team_pages'):
+            add_sizes(compressed_sizes, write_team_pages(sked, output_dir, html_filename, asset_urls, precompress))
+    if started_tracing:
+        tracemalloc.stop()
+    sizes = get_page_sizes(sked) if size_report else None
+    season_stats = get_season_stats(stats, sked, csv_filename, html_filename, compressed_sizes) if collect_stats else None
+    return html_filename, sked.get_index_title(), sizes, compressed_sizes, season_stats
+
+
+def index_sort_key(html_filename):
+    match = re.match(r'(winter|spring|summer|fall)-(\d{4})\.html$', html_filename)
+    if match:
+        return (0, int(match.group(2)), SEASON_ORDER[match.group(1).upper()], html_filename)
+    # Anything that isn't a regular season page goes at the end of the list
+    return (1, 0, 0, html_filename)
+
+
+def write_index(output_dir, built_pages, precompress=False):
+    # Keep any existing entries (e.g. older seasons we no longer have a csv for) and add/update the new ones
+    index_filename = os.path.join(output_dir, 'index.html')
+    pages = {}
+    if os.path.exists(index_filename):
+        with open(index_filename, 'r') as indexfile:
+            for href, link_title in re.findall(r'<li><a href="([^"]+)">([^<]*)</a></li>', indexfile.read()):
+                pages[href] = link_title
+    pages.update(built_pages)
+    parts = ['<html>\n',
+             '<head>\n',
+             '  <title>SCVL filterable schedules</title>\n',
+             '</head>\n',
+             '<body>\n',
+             '<h2>List of SCVL filterable schedules</h2>\n',
+             '<ul>\n']
+    for href in sorted(pages, key=index_sort_key):
+        parts.append('<li><a href="' + href + '">' + pages[href] + '</a></li>\n')
+    parts.extend(['</ul>\n', '</body>\n', '</html>\n'])
+    write_output(index_filename, ''.join(parts), precompress)
+
+
+def build_all_seasons(csv_dir, output_dir, start_col=None, debug=False, force=False, compact=False, size_report=False,
+                      team_pages=False, shared_assets=False, precompress=False, stats_output=None, stats_memory=False, parallel=True):
+    start_time = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    csv_filenames = find_csv_files([csv_dir])
+    manifest = load_manifest(output_dir)
+    options = {'start_col': start_col, 'compact': compact, 'team_pages': team_pages, 'shared_assets': shared_assets,
+               'precompress': get_precompress_formats(precompress)}
+    # Only rebuild the seasons whose csv changed since the last build (unless forced)
+    csv_hashes = {}
+    csvs_to_build = []
+    for csv_filename in csv_filenames:
+        csv_key = os.path.basename(csv_filename)
+        csv_hashes[csv_key] = hash_file(csv_filename)
+        if force or debug or size_report or stats_output or not is_up_to_date(manifest, csv_key, csv_hashes[csv_key], options,
+                                                                              output_dir):
+            csvs_to_build.append(csv_filename)
+        else:
+            print(csv_filename, '-> unchanged, skipping')
+    if not csvs_to_build and os.path.exists(os.path.join(output_dir, 'index.html')):
+        return
+
+    # The shared styles/scripts are written (once) before the pages that link to them
+    asset_urls = None
+    if shared_assets:
+        asset_urls, assets_compressed_sizes = write_shared_assets(output_dir, compact, precompress)
+        print_shared_assets_report(assets_compressed_sizes, len(csvs_to_build))
+        if precompress:
+            print_compression_report(SHARED_ASSETS_DIR + '/', assets_compressed_sizes)
+
+    # Each season is independent so build them all in parallel (unless there's only one to build, e.g.
+    # in watch mode, in which case starting up the worker processes would take longer than the build). When
+    # profiling everything has to run in this process or the profiler would only see the waiting
+    collect_stats = stats_output is not None
+    if len(csvs_to_build) == 1 or not parallel:
+        build_results = [build_season(f, output_dir, start_col, debug, compact, size_report, team_pages, asset_urls,
+                                      precompress, collect_stats, stats_memory)
+                         for f in csvs_to_build]
+    else:
+        with ProcessPoolExecutor() as executor:
+            futures = [executor.submit(build_season, f, output_dir, start_col, debug, compact, size_report, team_pages,
+                                       asset_urls, precompress, collect_stats, stats_memory)
+                       for f in csvs_to_build]
+            build_results = [future.result() for future in futures]
+    seasons_stats = []
+    for csv_filename, (html_filename, index_title, sizes, compressed_sizes, season_stats) in zip(csvs_to_build, build_results):
+        print(csv_filename, '->', html_filename)
+        if sizes:
+            print_size_report(html_filename, sizes)
+        if precompress:
+            print_compression_report(html_filename, compressed_sizes)
+        if season_stats:
+            seasons_stats.append(season_stats)
+        csv_key = os.path.basename(csv_filename)
+        manifest['seasons'][csv_key] = {
+            'csv_hash': csv_hashes[csv_key],
+            'options': options,
+            'html': html_filename,
+            'title': index_title,
+        }
+    # Forget about any csv files that have been removed from the folder
+    for csv_key in list(manifest['seasons']):
+        if csv_key not in csv_hashes:
+            del manifest['seasons'][csv_key]
+    built_pages = {entry['html']: entry['title'] for entry in manifest['seasons'].values()}
+    write_index(output_dir, built_pages, precompress)
+    save_manifest(output_dir, manifest)
+    if collect_stats:
+        write_stats(stats_output, seasons_stats, time.perf_counter() - start_time)
+
+
+def build_single_season(csv_filename, start_col=None, debug=False, force=False, compact=False, size_report=False,
+                        team_pages=False, shared_assets=False, precompress=False, stats_output=None, stats_memory=False):
+    start_time = time.perf_counter()
+    # Skip the build if neither the csv nor the styles/scripts changed since the last run
+    html_filename = 'generated_schedule.html'
+    manifest = load_manifest('.')
+    csv_key = os.path.abspath(csv_filename)
+    csv_hash = hash_file(csv_filename)
+    options = {'start_col': start_col, 'compact': compact, 'team_pages': team_pages, 'shared_assets': shared_assets,
+               'precompress': get_precompress_formats(precompress)}
+    if not (force or debug or size_report or stats_output) and is_up_to_date(manifest, csv_key, csv_hash, options, '.'):
+        print(html_filename, 'is up to date, nothing to do (use --force to rebuild anyway)')
+        return
+
+    # Time each phase of the build if stats were asked for (and track what it allocates, if that was too)
+    stats = BuildStats()
+    started_tracing = stats_output is not None and stats_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
 
     # Open the file and collect info about the schedule to be generated
-    with open(args.filename, newline='') as csvfile:
-        csv_reader = csv.reader(csvfile, delimiter=',', quotechar='"')
-        sked.parse_rows(csv_reader, args.start_col, args.debug)
+    sked = read_schedule(csv_filename, start_col, debug, stats)
 
     # Print extracted schedule if debug output enabled
-    if args.debug:
+    if debug:
         sked.print_extracted_sked()
+    if stats_output is not None:
+        validate_for_stats(sked, stats)
+
+    # Write the shared styles/scripts first if the page links to them instead of including them
+    asset_urls = None
+    if shared_assets:
+        asset_urls, assets_compressed_sizes = write_shared_assets('.', compact, precompress)
+        print_shared_assets_report(assets_compressed_sizes, 1)
+        if precompress:
+            print_compression_report(SHARED_ASSETS_DIR + '/', assets_compressed_sizes)
 
     # Generate the filterable html schedule
-    html_filename = 'generated_schedule.html'
-    with open(html_filename, 'w') as htmlfile:
-        sked.generate_html(htmlfile)
+    with stats.phase('render'):
+        page = render_season(sked, compact, asset_urls)
+    with stats.phase('write'):
+        compressed_sizes = add_sizes({}, write_output(html_filename, page, precompress))
+    if team_pages:
+        with stats.phase('team_pages'):
+            add_sizes(compressed_sizes, write_team_pages(sked, '.', html_filename, asset_urls, precompress))
+    if started_tracing:
+        tracemalloc.stop()
+    if precompress:
+        print_compression_report(html_filename, compressed_sizes)
+    if size_report:
+        print_size_report(html_filename, get_page_sizes(sked))
+
+    # Remember what we built from (only the last build is kept since it always writes the same file)
+    manifest['seasons'] = {csv_key: {
+        'csv_hash': csv_hash,
+        'options': options,
+        'html': html_filename,
+        'title': sked.get_index_title(),
+    }}
+    save_manifest('.', manifest)
+
+    if stats_output is not None:
+        season_stats = get_season_stats(stats, sked, csv_filename, html_filename, compressed_sizes)
+        write_stats(stats_output, [season_stats], time.perf_counter() - start_time)
+
+
+def get_csv_snapshot(path):
+    # Modification time and size of the csv file (or every csv file in the folder)
+    snapshot = {}
+    for csv_filename in find_csv_files([path]):
+        try:
+            stat = os.stat(csv_filename)
+        except FileNotFoundError:
+            continue  # e.g. in the middle of being replaced
+        snapshot[csv_filename] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+
+def watch_for_changes(path, build):
+    # Polls the csv(s) for changes and calls build once they stop changing. Seasons whose csv content
+    # didn't actually change are skipped thanks to the build manifest, so only the changed season is rebuilt
+    print('Watching', path, 'for changes (press Ctrl+C to stop)')
+    last_snapshot = get_csv_snapshot(path)
+    try:
+        while True:
+            time.sleep(WATCH_POLL_INTERVAL)
+            snapshot = get_csv_snapshot(path)
+            if snapshot == last_snapshot:
+                continue
+            # Wait for the file(s) to settle down before rebuilding
+            while True:
+                time.sleep(WATCH_DEBOUNCE_DELAY)
+                settled_snapshot = get_csv_snapshot(path)
+                if settled_snapshot == snapshot:
+                    break
+                snapshot = settled_snapshot
+            last_snapshot = snapshot
+            start_time = time.perf_counter()
+            try:
+                build()
+            except Exception as e:
+                # Most likely a half finished export of the sheet, so just wait for the next change
+                print('Rebuild failed:', repr(e))
+                continue
+            print(f'Rebuilt in {(time.perf_counter() - start_time) * 1000:.0f} ms')
+    except KeyboardInterrupt:
+        print('Stopped watching', path)
+
+
+def run_profiled(build, profile_output=None, trace_malloc_output=None):
+    # Runs a build under cProfile and/or tracemalloc, prints the top functions/allocations and dumps everything
+    # to the given files (overwriting the dumps of the last build in watch mode)
+    if trace_malloc_output:
+        tracemalloc.start()
+    profiler = cProfile.Profile() if profile_output else None
+    try:
+        if profiler:
+            profiler.runcall(build)
+        else:
+            build()
+        snapshot = tracemalloc.take_snapshot() if trace_malloc_output else None
+    finally:
+        if trace_malloc_output:
+            tracemalloc.stop()
+    if profiler:
+        profiler.dump_stats(profile_output)
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(PROFILE_TOP_COUNT)
+        print('Wrote profile to', profile_output)
+    if snapshot:
+        snapshot.dump(trace_malloc_output)
+        print(f'Top {PROFILE_TOP_COUNT} lines by memory still allocated at the end of the build:')
+        for stat in snapshot.statistics('lineno')[:PROFILE_TOP_COUNT]:
+            print(' ', stat)
+        print('Wrote allocation snapshot to', trace_malloc_output)
+
+
+def main():
+    # Get the input csv filename from the command line
+    parser = argparse.ArgumentParser()
+    parser.add_argument('filename', help='csv file to parse (or a folder of csv files when using --batch)')
+    parser.add_argument('-s', '--start-col', help='first column in csv that is not blank (detected automatically if not given)', type=int)
+    parser.add_argument('-d', '--debug', help='print debugging output', action='store_true')
+    parser.add_argument('-b', '--batch', help='build every csv in the given folder and regenerate index.html', action='store_true')
+    parser.add_argument('-o', '--output-dir', help='folder to write the html files to in batch mode', default='.')
+    parser.add_argument('-f', '--force', help='rebuild even if the csv has not changed since the last build', action='store_true')
+    parser.add_argument('-c', '--compact', help='write the schedule as compact data that is rendered in the browser', action='store_true')
+    parser.add_argument('--size-report', help='print the page size of the full and compact output modes', action='store_true')
+    parser.add_argument('-t', '--team-pages', help='also write a page and an .ics calendar for every team', action='store_true')
+    parser.add_argument('-a', '--shared-assets', help='write the styles and scripts to shared files instead of into every page',
+                        action='store_true')
+    parser.add_argument('-z', '--precompress', help='also write .gz (and .br, if brotli is installed) versions of every file',
+                        action='store_true')
+    parser.add_argument('-w', '--watch', help='keep running and rebuild whenever the csv file (or folder) changes', action='store_true')
+    parser.add_argument('--stats', help='print the time and memory taken by each phase of the build as json (or write it to FILE)',
+                        nargs='?', const='-', metavar='FILE')
+    parser.add_argument('--stats-memory', help='also track the memory allocated by each phase in the --stats output (the build '
+                        'runs several times slower while tracking, so the times are off then)', action='store_true')
+    parser.add_argument('--profile', help='run the build under cProfile and write the profile to FILE (for pstats/snakeviz)',
+                        metavar='FILE')
+    parser.add_argument('--trace-malloc', help='trace the memory allocated by the build and write a tracemalloc snapshot to FILE',
+                        metavar='FILE')
+    args = parser.parse_args()
+    if args.stats_memory and not args.stats:
+        args.stats = '-'
+
+    if args.batch:
+        # Profiling only sees this process, so the seasons aren't built in worker processes then
+        build = functools.partial(build_all_seasons, args.filename, args.output_dir, args.start_col, args.debug,
+                                  args.force, args.compact, args.size_report, args.team_pages, args.shared_assets, args.precompress,
+                                  args.stats, args.stats_memory, parallel=not (args.profile or args.trace_malloc))
+    else:
+        build = functools.partial(build_single_season, args.filename, args.start_col, args.debug, args.force,
+                                  args.compact, args.size_report, args.team_pages, args.shared_assets, args.precompress,
+                                  args.stats, args.stats_memory)
+    if args.profile or args.trace_malloc:
+        build = functools.partial(run_profiled, build, args.profile, args.trace_malloc)
+    build()
+
+    # Keep rebuilding whenever the csv(s) change if watch mode is on
+    if args.watch:
+        watch_for_changes(args.filename, build)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import sqlite3
+import sys
+
+from generator import DIVISIONS, find_csv_files, get_division, hash_file, index_sort_key, read_schedule
+
+DEFAULT_DB_FILENAME = 'schedule_history.db'
+
+# Kinds of things that can be on a court in a time slot
+GAME_KIND_GAME = 'game'
+GAME_KIND_OPEN_PLAY = 'open_play'
+GAME_KIND_SKILLS_CLINIC = 'skills_clinic'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS seasons (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    csv_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS teams (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    division TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS courts (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS weeks (
+    id INTEGER PRIMARY KEY,
+    season_id INTEGER NOT NULL REFERENCES seasons(id) ON DELETE CASCADE,
+    week_num INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    date TEXT,
+    is_tba INTEGER NOT NULL,
+    UNIQUE (season_id, week_num)
+);
+CREATE TABLE IF NOT EXISTS slots (
+    id INTEGER PRIMARY KEY,
+    week_id INTEGER NOT NULL REFERENCES weeks(id) ON DELETE CASCADE,
+    slot_num INTEGER NOT NULL,
+    time TEXT NOT NULL,
+    UNIQUE (week_id, slot_num)
+);
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    slot_id INTEGER NOT NULL REFERENCES slots(id) ON DELETE CASCADE,
+    court_id INTEGER NOT NULL REFERENCES courts(id),
+    kind TEXT NOT NULL,
+    title TEXT,
+    team_1_id INTEGER REFERENCES teams(id),
+    team_2_id INTEGER REFERENCES teams(id)
+);
+CREATE TABLE IF NOT EXISTS refs (
+    game_id INTEGER NOT NULL REFERENCES games(id) ON DELETE CASCADE,
+    team_id INTEGER NOT NULL REFERENCES teams(id),
+    PRIMARY KEY (game_id, team_id)
+);
+CREATE TABLE IF NOT EXISTS byes (
+    week_id INTEGER NOT NULL REFERENCES weeks(id) ON DELETE CASCADE,
+    team_id INTEGER NOT NULL REFERENCES teams(id),
+    PRIMARY KEY (week_id, team_id)
+);
+CREATE INDEX IF NOT EXISTS weeks_season ON weeks(season_id);
+CREATE INDEX IF NOT EXISTS slots_week ON slots(week_id);
+CREATE INDEX IF NOT EXISTS games_slot ON games(slot_id);
+CREATE INDEX IF NOT EXISTS games_court ON games(court_id);
+CREATE INDEX IF NOT EXISTS games_team_1 ON games(team_1_id, team_2_id);
+CREATE INDEX IF NOT EXISTS games_team_2 ON games(team_2_id, team_1_id);
+CREATE INDEX IF NOT EXISTS refs_team ON refs(team_id);
+CREATE INDEX IF NOT EXISTS byes_team ON byes(team_id);
+'''
+
+
+def connect(db_filename):
+    conn = sqlite3.connect(db_filename)
+    conn.row_factory = sqlite3.Row
+    # Needed for deleting a season to also delete its weeks, slots, games, refs and byes
+    conn.execute('PRAGMA foreign_keys = ON')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def get_ids(conn, table, names, extra_columns=None):
+    # Ids of the given teams/courts, adding any that aren't in the table yet
+    extra_columns = extra_columns or {}
+    columns = ['name'] + list(extra_columns)
+    conn.executemany(f'INSERT OR IGNORE INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+                     [[name] + [func(name) for func in extra_columns.values()] for name in names])
+    return {row['name']: row['id'] for row in conn.execute(f'SELECT id, name FROM {table}')}
+
+
+def ingest_season(conn, sked, csv_hash, force=False):
+    # Replaces everything stored for the season in a single transaction, so ingesting the same season again
+    # never leaves duplicates (or half a season if something goes wrong). Returns False if it was already up to date
+    name = sked.get_page_filename()[:-len('.html')]
+    row = conn.execute('SELECT csv_hash FROM seasons WHERE name = ?', (name,)).fetchone()
+    if row and row['csv_hash'] == csv_hash and not force:
+        return False
+
+    with conn:
+        conn.execute('DELETE FROM seasons WHERE name = ?', (name,))
+        season_id = conn.execute('INSERT INTO seasons (name, title, csv_hash) VALUES (?, ?, ?)',
+                                 (name, sked.get_index_title(), csv_hash)).lastrowid
+        # Every name that shows up anywhere gets a team id, even typos, so nothing in the schedule is lost
+        team_names = set(sked.get_all_teams())
+        for week_sked in sked.weekly_skeds.values():
+            team_names.update(week_sked.bye_week_teams)
+            for ts_sked in week_sked.time_slot_skeds.values():
+                for game in ts_sked.time_slot_games.values():
+                    team_names.update(team for team in (game.team_1, game.team_2, game.ref_team) if team)
+        team_ids = get_ids(conn, 'teams', sorted(team_names),
+                           {'division': lambda team_name: get_division(team_name) or ''})
+        court_ids = get_ids(conn, 'courts', sked.court_titles)
+
+        week_dates = sked.get_week_dates()
+        games = []
+        refs = []
+        for week_num, week_title in enumerate(sked.week_titles, start=1):
+            week_sked = sked.weekly_skeds[week_title]
+            week_date = week_dates[week_title]
+            week_id = conn.execute('INSERT INTO weeks (season_id, week_num, title, date, is_tba) VALUES (?, ?, ?, ?, ?)',
+                                   (season_id, week_num, week_title, week_date.isoformat() if week_date else None,
+                                    int(week_sked.is_tba))).lastrowid
+            conn.executemany('INSERT OR IGNORE INTO byes (week_id, team_id) VALUES (?, ?)',
+                             [(week_id, team_ids[team]) for team in week_sked.bye_week_teams])
+            for slot_num, time_slot in enumerate(week_sked.time_slots, start=1):
+                slot_id = conn.execute('INSERT INTO slots (week_id, slot_num, time) VALUES (?, ?, ?)',
+                                       (week_id, slot_num, time_slot)).lastrowid
+                for court, game in week_sked.time_slot_skeds[time_slot].time_slot_games.items():
+                    if game.is_skills_clinic:
+                        games.append((slot_id, court_ids[court], GAME_KIND_SKILLS_CLINIC, game.skills_clinic_title, None, None))
+                    elif game.is_open_play:
+                        games.append((slot_id, court_ids[court], GAME_KIND_OPEN_PLAY, game.open_play_title, None, None))
+                    else:
+                        games.append((slot_id, court_ids[court], GAME_KIND_GAME, None, team_ids[game.team_1], team_ids[game.team_2]))
+                    refs.append(team_ids[game.ref_team] if game.ref_team else None)
+        # Games are added in one go, so their ids are needed afterwards to add the refs
+        first_game_id = (conn.execute('SELECT MAX(id) FROM games').fetchone()[0] or 0) + 1
+        conn.executemany('INSERT INTO games (id, slot_id, court_id, kind, title, team_1_id, team_2_id) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         [(first_game_id + idx,) + game for idx, game in enumerate(games)])
+        conn.executemany('INSERT INTO refs (game_id, team_id) VALUES (?, ?)',
+                         [(first_game_id + idx, team_id) for idx, team_id in enumerate(refs) if team_id is not None])
+    return True
+
+
+def ingest_csvs(conn, paths, force=False):
+    for csv_filename in find_csv_files(paths):
+        sked = read_schedule(csv_filename)
+        if ingest_season(conn, sked, hash_file(csv_filename), force):
+            print(csv_filename, '-> ingested as', sked.get_page_filename()[:-len('.html')])
+        else:
+            print(csv_filename, '-> unchanged, skipping')
+
+
+# Joins from a game to its slot, week and season used by most of the queries
+GAME_JOINS = '''
+    JOIN slots ON slots.id = games.slot_id
+    JOIN weeks ON weeks.id = slots.week_id
+    JOIN seasons ON seasons.id = weeks.season_id
+    JOIN courts ON courts.id = games.court_id
+'''
+
+
+def head_to_head(conn, team_1, team_2):
+    # Every game between two teams, across all seasons
+    return conn.execute(f'''
+        SELECT seasons.name AS season, weeks.week_num AS week, weeks.date, slots.time, courts.name AS court,
+               t1.name AS team_1, t2.name AS team_2, r.name AS ref
+        FROM teams a
+        JOIN teams b ON b.name = :team_2
+        JOIN games ON (games.team_1_id = a.id AND games.team_2_id = b.id) OR (games.team_1_id = b.id AND games.team_2_id = a.id)
+        {GAME_JOINS}
+        JOIN teams t1 ON t1.id = games.team_1_id
+        JOIN teams t2 ON t2.id = games.team_2_id
+        LEFT JOIN refs ON refs.game_id = games.id
+        LEFT JOIN teams r ON r.id = refs.team_id
+        WHERE a.name = :team_1
+        ORDER BY weeks.week_num, slots.slot_num
+    ''', {'team_1': team_1, 'team_2': team_2}).fetchall()
+
+
+def ref_load(conn, division=None):
+    # Number of times each team reffed in each season, along with the average for its division that season
+    return conn.execute('''
+        WITH counts AS (
+            SELECT seasons.name AS season, teams.name AS team, teams.division, COUNT(*) AS refs
+            FROM refs
+            JOIN teams ON teams.id = refs.team_id
+            JOIN games ON games.id = refs.game_id
+            JOIN slots ON slots.id = games.slot_id
+            JOIN weeks ON weeks.id = slots.week_id
+            JOIN seasons ON seasons.id = weeks.season_id
+            WHERE :division IS NULL OR teams.division = :division
+            GROUP BY seasons.id, teams.id
+        )
+        SELECT season, team, division, refs,
+               ROUND(AVG(refs) OVER (PARTITION BY season, division), 2) AS division_average
+        FROM counts
+        ORDER BY season, division, refs DESC, team
+    ''', {'division': division}).fetchall()
+
+
+def court_usage(conn):
+    # How each court was used in each season (games, open play and skills clinic slots)
+    return conn.execute(f'''
+        SELECT seasons.name AS season, courts.name AS court, COUNT(*) AS slots,
+               SUM(games.kind = '{GAME_KIND_GAME}') AS games,
+               SUM(games.kind = '{GAME_KIND_OPEN_PLAY}') AS open_play,
+               SUM(games.kind = '{GAME_KIND_SKILLS_CLINIC}') AS skills_clinic,
+               ROUND(100.0 * SUM(games.kind = '{GAME_KIND_GAME}') / COUNT(*), 1) AS game_pct
+        FROM games
+        {GAME_JOINS}
+        GROUP BY seasons.id, courts.id
+        ORDER BY season, court
+    ''').fetchall()
+
+
+def print_rows(rows, as_json, sort_key=None):
+    rows = [dict(row) for row in rows]
+    if sort_key:
+        rows.sort(key=sort_key)
+    if as_json:
+        print(json.dumps(rows, indent=2))
+        return
+    if not rows:
+        print('(no results)')
+        return
+    columns = list(rows[0])
+    widths = [max(len(column), *(len(str(row[column])) for row in rows)) for column in columns]
+    print('  '.join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(str(row[column]).ljust(width) for column, width in zip(columns, widths)))
+
+
+def season_sort_key(row):
+    # Season names sort the same way as the pages in index.html (oldest first)
+    return index_sort_key(row['season'] + '.html')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Store every season in a database and answer questions across seasons')
+    parser.add_argument('--db', help='database file to use', default=DEFAULT_DB_FILENAME)
+    parser.add_argument('-j', '--json', help='print the results as json', action='store_true')
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = commands.add_parser('ingest', help='add (or update) seasons from csv files or folders of csv files')
+    ingest_parser.add_argument('paths', nargs='+')
+    ingest_parser.add_argument('-f', '--force', help='ingest even if the csv has not changed since last time', action='store_true')
+    head_to_head_parser = commands.add_parser('head-to-head', help='every game between two teams')
+    head_to_head_parser.add_argument('teams', nargs=2)
+    ref_load_parser = commands.add_parser('ref-load', help='number of refs per team in each season')
+    ref_load_parser.add_argument('--division', choices=DIVISIONS)
+    commands.add_parser('court-usage', help='how each court was used in each season')
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    try:
+        if args.command == 'ingest':
+            ingest_csvs(conn, args.paths, args.force)
+        elif args.command == 'head-to-head':
+            team_1, team_2 = (team.upper() for team in args.teams)
+            print_rows(head_to_head(conn, team_1, team_2), args.json, season_sort_key)
+        elif args.command == 'ref-load':
+            print_rows(ref_load(conn, args.division), args.json, season_sort_key)
+        elif args.command == 'court-usage':
+            print_rows(court_usage(conn), args.json, season_sort_key)
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
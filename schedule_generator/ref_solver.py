@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import io
+import json
+import sys
+
+from generator import DIVISIONS, Schedule, ROW_COURTS, ROW_TIME_SLOT, ROW_WEEK_TITLE, get_cell, get_division, write_file_atomic
+from validator import OccupancyMatrix, SEVERITY_ERROR, SEVERITY_WARNING, validate_schedule
+
+# Exit codes for the command line
+EXIT_OK = 0
+EXIT_UNASSIGNED = 1
+
+# Division whose teams can ref a division's games when none of its own teams are free, i.e. the one below it
+# (same as getLowerLevel in filter_funcs.js)
+LOWER_LEVELS = dict(zip(DIVISIONS[1:], DIVISIONS))
+
+
+class RefSolver:
+    # Picks a ref for every game, one game at a time in the order they're played. Which teams are on a court in
+    # each time slot is kept in the validator's team x week x time slot occupancy arrays, and each pick updates
+    # them straight away, so checking whether a team is free is a couple of array lookups instead of going back
+    # over the schedule
+    def __init__(self, sked, keep_refs=False):
+        self.sked = sked
+        if not keep_refs:
+            for week_title in sked.week_titles:
+                week_sked = sked.weekly_skeds[week_title]
+                for time_slot in week_sked.time_slots:
+                    for game in week_sked.time_slot_skeds[time_slot].time_slot_games.values():
+                        game.ref_team = ''
+        self.matrix = OccupancyMatrix(sked)
+        # Only teams that are part of a division are picked (any other names in the schedule are typos)
+        self.division_teams = {division: [] for division in sked.get_team_counts()}
+        for team_id in range(self.matrix.num_known_teams):
+            self.division_teams[get_division(self.matrix.teams[team_id])].append(team_id)
+        self.ref_counts = [sum(self.matrix.reffing[self.matrix.team_slice(team_id)])
+                           for team_id in range(len(self.matrix.teams))]
+        # Games given a ref by the solver, as (week number, time slot number, game)
+        self.assigned = []
+
+    def is_free(self, team_id, week_num, slot_num):
+        cell = self.matrix.cell(team_id, week_num, slot_num)
+        return not (self.matrix.playing[cell] or self.matrix.reffing[cell])
+
+    def plays_in(self, team_id, week_num, slot_num):
+        return 0 <= slot_num < self.matrix.num_slots and self.matrix.playing[self.matrix.cell(team_id, week_num, slot_num)]
+
+    def plays_adjacent(self, team_id, week_num, slot_num):
+        return self.plays_in(team_id, week_num, slot_num - 1) or self.plays_in(team_id, week_num, slot_num + 1)
+
+    def plays_week(self, team_id, week_num):
+        return any(self.matrix.playing[self.matrix.week_slice(team_id, week_num)])
+
+    def pick_ref(self, division, week_num, slot_num):
+        # The best free team of the division: one that's already there for a game just before or after, that
+        # has reffed the least this season and then this week. Teams that don't play that week aren't asked to
+        # come in just to ref
+        best_team_id, best_key = None, None
+        for team_id in self.division_teams.get(division, []):
+            if not self.is_free(team_id, week_num, slot_num) or not self.plays_week(team_id, week_num):
+                continue
+            week_slice = self.matrix.week_slice(team_id, week_num)
+            key = (not self.plays_adjacent(team_id, week_num, slot_num), self.ref_counts[team_id],
+                   sum(self.matrix.reffing[week_slice]), team_id)
+            if best_key is None or key < best_key:
+                best_team_id, best_key = team_id, key
+        return best_team_id
+
+    def solve(self):
+        # Returns the games that no team could ref, as (week, time slot, game)
+        unassigned = []
+        for week_num, slot_num, game in self.matrix.iter_games(self.sked):
+            if game.ref_team:
+                continue
+            division = get_division(game.team_1)
+            team_id = self.pick_ref(division, week_num, slot_num)
+            if team_id is None and division in LOWER_LEVELS:
+                team_id = self.pick_ref(LOWER_LEVELS[division], week_num, slot_num)
+            if team_id is None:
+                week_title = self.matrix.weeks[week_num]
+                unassigned.append((week_title, self.sked.weekly_skeds[week_title].time_slots[slot_num], game))
+                continue
+            self.set_ref(game, team_id, week_num, slot_num)
+            self.assigned.append((week_num, slot_num, game))
+        self.balance()
+        return unassigned
+
+    def set_ref(self, game, team_id, week_num, slot_num):
+        if game.ref_team:
+            old_team_id = self.matrix.team_ids[game.ref_team]
+            self.matrix.reffing[self.matrix.cell(old_team_id, week_num, slot_num)] -= 1
+            self.ref_counts[old_team_id] -= 1
+        game.ref_team = self.matrix.teams[team_id]
+        self.matrix.reffing[self.matrix.cell(team_id, week_num, slot_num)] += 1
+        self.ref_counts[team_id] += 1
+
+    def balance(self):
+        # Picking one game at a time can still leave some teams with 2 or more refs than others in their division
+        # by the end of the season, so hand ref duties from the busiest teams to the least busy ones until no more
+        # can be moved. The new ref has to be free and playing that week (preferably just before or after the
+        # game), so no team is brought in just to ref. Only refs picked here are moved, not the ones kept from
+        # the csv
+        moved = True
+        while moved:
+            moved = self.move_refs() or any(self.move_chain(division) for division in self.division_teams)
+
+    def move_refs(self):
+        moved = False
+        for week_num, slot_num, game in self.assigned:
+            ref_id = self.matrix.team_ids[game.ref_team]
+            best_team_id, best_key = None, None
+            for team_id in self.division_teams[get_division(game.ref_team)]:
+                if (self.ref_counts[team_id] <= self.ref_counts[ref_id] - 2 and
+                        self.is_free(team_id, week_num, slot_num) and self.plays_week(team_id, week_num)):
+                    key = (not self.plays_adjacent(team_id, week_num, slot_num), self.ref_counts[team_id], team_id)
+                    if best_key is None or key < best_key:
+                        best_team_id, best_key = team_id, key
+            if best_team_id is not None:
+                self.set_ref(game, best_team_id, week_num, slot_num)
+                moved = True
+        return moved
+
+    def move_chain(self, division):
+        # When none of the least busy team's free slots line up with a game of the busiest team, look for a chain
+        # instead: the busiest team hands a game to a team that hands one of its own games on, and so on until a
+        # team with 2 or more fewer refs takes one. Everyone in between keeps the same number of refs
+        team_ids = self.division_teams[division]
+        games_by_ref = {}
+        for week_num, slot_num, game in self.assigned:
+            games_by_ref.setdefault(self.matrix.team_ids[game.ref_team], []).append((week_num, slot_num, game))
+        for start_id in sorted(team_ids, key=lambda team_id: -self.ref_counts[team_id]):
+            # Breadth first, so the chain is as short as possible
+            handed_from = {start_id: None}
+            queue = [start_id]
+            for team_id in queue:
+                for week_num, slot_num, game in games_by_ref.get(team_id, []):
+                    for next_id in team_ids:
+                        if (next_id in handed_from or not self.is_free(next_id, week_num, slot_num) or
+                                not self.plays_week(next_id, week_num)):
+                            continue
+                        handed_from[next_id] = (team_id, week_num, slot_num, game)
+                        if self.ref_counts[next_id] <= self.ref_counts[start_id] - 2:
+                            while handed_from[next_id]:
+                                team_id, week_num, slot_num, game = handed_from[next_id]
+                                self.set_ref(game, next_id, week_num, slot_num)
+                                next_id = team_id
+                            return True
+                        queue.append(next_id)
+        return False
+
+    def fix_byes(self):
+        # Byes are the teams that aren't on a court at all that week. Returns the titles of the weeks whose
+        # bye list changed
+        fixed_weeks = []
+        for week_num, week_title in enumerate(self.matrix.weeks):
+            byes = [self.matrix.teams[team_id] for team_id in range(self.matrix.num_known_teams)
+                    if not any(self.matrix.playing[self.matrix.week_slice(team_id, week_num)]) and
+                    not any(self.matrix.reffing[self.matrix.week_slice(team_id, week_num)])]
+            week_sked = self.sked.weekly_skeds[week_title]
+            if set(byes) != set(week_sked.bye_week_teams):
+                week_sked.bye_week_teams = byes
+                fixed_weeks.append(week_title)
+        return fixed_weeks
+
+    def get_ref_counts(self):
+        return {self.matrix.teams[team_id]: self.ref_counts[team_id] for team_id in range(self.matrix.num_known_teams)}
+
+
+def get_ref_spread(sked, ref_counts):
+    # (fewest, most) refs of any team in each division
+    spread = {}
+    for division in sked.get_team_counts():
+        counts = [count for team, count in ref_counts.items() if get_division(team) == division]
+        if counts:
+            spread[division] = (min(counts), max(counts))
+    return spread
+
+
+def get_wider_spreads(spread_before, spread_after):
+    # Divisions whose refs are spread less evenly than in the csv (if the csv had refs in it at all)
+    return [division for division, (fewest, most) in spread_after.items()
+            if division in spread_before and spread_before[division][1] > 0 and
+            most - fewest > spread_before[division][1] - spread_before[division][0]]
+
+
+def set_cell(row, col_num, value):
+    # A negative column would silently overwrite a cell counted from the end of the row
+    if col_num < 0:
+        raise ValueError(f'invalid column number {col_num}')
+    if col_num >= len(row):
+        row.extend([''] * (col_num + 1 - len(row)))
+    row[col_num] = value
+
+
+def update_rows(sked, rows):
+    # Writes the refs and byes of the schedule back into the csv rows it was parsed from, so everything else in
+    # the sheet (layout, notes, etc.) stays as it was
+    curr_week = ''
+    court_cols = []
+    week_rows = {}
+    for row_type, row in sked.iter_schedule_rows(rows, sked.start_col):
+        if row_type == ROW_WEEK_TITLE:
+            curr_week = get_cell(row, sked.start_col + 2)
+        elif row_type == ROW_COURTS:
+            court_cols = [(row[idx], idx + 1) for idx in range(len(row)) if row[idx]]
+        elif row_type == ROW_TIME_SLOT:
+            week_sked = sked.weekly_skeds[curr_week]
+            time_slot_games = week_sked.time_slot_skeds[row[sked.start_col]].time_slot_games
+            for court_title, court_col_num in court_cols:
+                game = time_slot_games[court_title]
+                if not (game.is_skills_clinic or game.is_open_play):
+                    set_cell(row, court_col_num + 1, 'ref: ' + game.ref_team if game.ref_team else '')
+            week_rows.setdefault(curr_week, []).append(row)
+    # Byes are only rewritten for the weeks where they changed, one division per row like in the sheet (and
+    # not at all if the sheet has no BYE column)
+    if sked.bye_week_col_num < 0:
+        return rows
+    for week_title, rows_in_week in week_rows.items():
+        byes = sked.weekly_skeds[week_title].bye_week_teams
+        listed_byes = [team for row in rows_in_week for team in get_cell(row, sked.bye_week_col_num).split()]
+        if listed_byes != byes:
+            division_byes = {}
+            for team in byes:
+                division_byes.setdefault(get_division(team), []).append(team)
+            lines = [' '.join(teams) for teams in division_byes.values()]
+            # Any divisions that don't fit share the last row
+            lines[len(rows_in_week) - 1:] = [' '.join(lines[len(rows_in_week) - 1:])]
+            for row_num, row in enumerate(rows_in_week):
+                set_cell(row, sked.bye_week_col_num, lines[row_num] if row_num < len(lines) else '')
+    return rows
+
+
+def write_csv(filename, rows, final_newline=True):
+    # Downloaded csvs don't always end with a newline, so that can be left off to match
+    csv_file = io.StringIO()
+    csv.writer(csv_file, lineterminator='\n').writerows(rows)
+    text = csv_file.getvalue()
+    write_file_atomic(filename, text if final_newline else text[:-1], newline='')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill in the refs (and byes) of a schedule csv automatically')
+    parser.add_argument('filename', help='csv file of the schedule')
+    parser.add_argument('-s', '--start-col', help='first column in csv that is not blank (detected automatically if not given)', type=int)
+    parser.add_argument('-o', '--output', help='write the csv with the refs filled in to this file')
+    parser.add_argument('-k', '--keep-refs', help='keep the refs already in the csv and only fill in the empty ones', action='store_true')
+    parser.add_argument('-j', '--json', help='print the results as json', action='store_true')
+    args = parser.parse_args()
+
+    with open(args.filename, newline='') as csvfile:
+        csv_text = csvfile.read()
+    rows = list(csv.reader(io.StringIO(csv_text, newline=''), delimiter=',', quotechar='"'))
+    sked = Schedule()
+    sked.parse_rows(rows, args.start_col)
+    spread_before = get_ref_spread(sked, validate_schedule(sked).stats['ref_counts'])
+
+    solver = RefSolver(sked, args.keep_refs)
+    unassigned = solver.solve()
+    # Without a BYE column in the sheet there's nowhere to put the byes
+    has_byes = sked.bye_week_col_num >= 0
+    fixed_weeks = solver.fix_byes() if has_byes else []
+    ref_counts = solver.get_ref_counts()
+    wider_spreads = get_wider_spreads(spread_before, get_ref_spread(sked, ref_counts))
+    result = validate_schedule(sked)
+    if args.output:
+        write_csv(args.output, update_rows(sked, rows), csv_text.endswith('\n'))
+
+    if args.json:
+        print(json.dumps({
+            'title': sked.title,
+            'unassigned': [{'week': week, 'time': time_slot, 'court': game.court_name} for week, time_slot, game in unassigned],
+            'byes_fixed': fixed_weeks if has_byes else None,
+            'ref_counts': ref_counts,
+            'wider_spread': wider_spreads,
+            'errors': result.count(SEVERITY_ERROR),
+            'warnings': result.count(SEVERITY_WARNING),
+        }, indent=2))
+    else:
+        print(f'{args.filename} ({sked.title}): {len(unassigned)} game(s) without a ref, byes fixed in {len(fixed_weeks)} week(s), '
+              f'{result.count(SEVERITY_ERROR)} errors, {result.count(SEVERITY_WARNING)} warnings')
+        for division, (fewest, most) in get_ref_spread(sked, ref_counts).items():
+            before = spread_before.get(division)
+            print(f'  {division} refs per team: {fewest}-{most}' + (f' (was {before[0]}-{before[1]})' if before else ''))
+        for division in wider_spreads:
+            print(f'  WARNING: {division} refs are spread less evenly than in {args.filename}')
+        if not has_byes:
+            print(f'  {args.filename} has no BYE column, so the byes were left alone')
+        for week, time_slot, game in unassigned:
+            print(f'  No free team to ref {game.team_1} v {game.team_2} in {week} at {time_slot} on {game.court_name}')
+        if args.output:
+            print(f'Wrote {args.output}')
+    return EXIT_UNASSIGNED if unassigned else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+// Builds the schedule table from the compact schedule data written by generator.py (see
+// Schedule.get_schedule_data) and returns the team index used by filterSchedule()
+function getTeamDivision(teamName) {
+  if (teamName.includes("REC")) {
+    return "rec";
+  } else if (teamName.includes("INT")) {
+    return "int";
+  } else if (teamName.includes("COM")) {
+    return "com";
+  } else if (teamName.includes("POW")) {
+    return "pow";
+  } else if (teamName.includes("P+")) {
+    return "pow_plus";
+  }
+  return "unknown";
+}
+
+function spacerRow() {
+  return '<tr class="spacer"><td colspan="26" class="spacer_row"><div style="height: 20px;"></div></td></tr>';
+}
+
+function courtHeadersRow(courts) {
+  const courtColWidthPct = 75 / courts.length;
+  let cells = ['<th colspan="1" style="width:7%;"></th>'];
+  for (const court of courts) {
+    cells.push('<th colspan="5" style="width:' + courtColWidthPct + '%;">' + court + '</th>');
+  }
+  return '<tr class="header">' + cells.join("") + '</tr>';
+}
+
+function noPlayWeekRow(title) {
+  return '<tr class="week"><td colspan="26" class="no_play_week">' + title + '</td></tr>';
+}
+
+function noPlayWeekBlock(title) {
+  return '<tbody>' + noPlayWeekRow(title) + spacerRow() + '</tbody>';
+}
+
+function renderWeekRows(week, weekNum, courts, addToIndex) {
+  let rows = [];
+  if (week.tba) {
+    rows.push('<tr class="week"><td></td><td colspan="5" class="playoff_week">' + week.title + '</td><td colspan="20"></td></tr>');
+    for (const title of week.no_play_after || []) {
+      rows.push(noPlayWeekRow(title), spacerRow());
+    }
+    rows.push(courtHeadersRow(courts));
+    rows.push('<tr class="spacer"><td colspan="26" class="tba_row">SCHEDULE TO BE ANNOUNCED SOON</td></tr>');
+    return rows;
+  }
+  rows.push('<tr class="week"><td></td><td colspan="25" class="week_row">' + week.title + '</td></tr>');
+  // Games that changed since the previous export are listed as [time slot number, court number]
+  const updatedGames = new Set((week.updated || []).map(([slotNum, courtNum]) => slotNum + "," + courtNum));
+  const updatedByes = new Set(week.updated_byes || []);
+  // Row/cell numbers must match what generate_html puts in the team index
+  let rowNum = 1;
+  for (const slot of week.slots) {
+    let cells = ['<td class="' + (week.changed ? "changed" : "time") + '">' + slot[0] + '</td>'];
+    let cellNum = 1;
+    for (let court = 1; court < slot.length; court++) {
+      const game = slot[court];
+      const updated = updatedGames.has((rowNum - 1) + "," + (court - 1)) ? " updated" : "";
+      if (game.length == 2) {
+        // Open play or skills clinic: [class name, title]
+        cells.push('<td colspan="5" class="' + game[0] + updated + '">' + game[1] + '</td>');
+        addToIndex(game[0].toUpperCase(), [weekNum, rowNum, cellNum, SPECIAL]);
+        cellNum += 1;
+      } else {
+        // Regular game: [team 1, team 2, ref team]
+        const [team1, team2, refTeam] = game;
+        const teamDiv = getTeamDivision(team1) + updated;
+        cells.push('<td class="team1 ' + teamDiv + '">' + team1 + '</td>',
+                   '<td class="vs ' + teamDiv + '">vs</td>',
+                   '<td class="team2 ' + teamDiv + '">' + team2 + '</td>',
+                   '<td class="ref ' + teamDiv + '">ref:</td>',
+                   '<td class="team_ref ' + teamDiv + '">' + refTeam + '</td>');
+        addToIndex(team1, [weekNum, rowNum, cellNum, TEAM_1]);
+        addToIndex(team2, [weekNum, rowNum, cellNum + 2, TEAM_2]);
+        if (refTeam) {
+          addToIndex(refTeam, [weekNum, rowNum, cellNum + 4, REF]);
+        }
+        cellNum += 5;
+      }
+    }
+    rows.push('<tr class="games">' + cells.join("") + '</tr>');
+    rowNum++;
+  }
+  if (week.byes) {
+    let cells = ['<td class="bye_week">Bye Week</td>'];
+    week.byes.forEach((byeTeam, idx) => {
+      const updated = updatedByes.has(byeTeam) ? " updated" : "";
+      cells.push('<td colspan="2" class="bye ' + getTeamDivision(byeTeam) + updated + '">' + byeTeam + '</td>');
+      addToIndex(byeTeam, [weekNum, rowNum, idx + 1, BYE]);
+    });
+    cells.push('<td colspan="' + (25 - week.byes.length) + '" class="empty_row"></td>');
+    rows.push('<tr class="byes">' + cells.join("") + '</tr>');
+  }
+  if (week.slots.length > 0) {
+    rows.push(spacerRow());
+  }
+  return rows;
+}
+
+function renderSchedule(table, data) {
+  let teamIndex = {};
+  function addToIndex(key, entry) {
+    if (!(key in teamIndex)) {
+      teamIndex[key] = [];
+    }
+    teamIndex[key].push(entry);
+  }
+
+  // Build the table as one string so the browser only has to parse it once. Only the title row of each week
+  // goes in at first, the rest of its rows are added when the week scrolls into view (or the filter needs
+  // it), so opening the page doesn't mean laying out the whole season
+  let html = ['<tbody>' + courtHeadersRow(data.courts) + spacerRow() + '</tbody>'];
+  data.weeks.forEach((week, weekNum) => {
+    for (const title of week.no_play_before || []) {
+      html.push(noPlayWeekBlock(title));
+    }
+    const rows = renderWeekRows(week, weekNum, data.courts, addToIndex);
+    html.push('<tbody id="week_' + weekNum + '">', rows[0], '</tbody>');
+    pendingWeeks[weekNum] = rows;
+  });
+  for (const title of data.no_play_end) {
+    html.push(noPlayWeekBlock(title));
+  }
+  table.innerHTML = html.join("\n");
+
+  if (!("IntersectionObserver" in window)) {
+    data.weeks.forEach((week, weekNum) => getWeekBody(weekNum));
+    return teamIndex;
+  }
+  const observer = new IntersectionObserver(entries => {
+    for (const entry of entries) {
+      // Collapsed weeks are added when they're expanded (see togglePastWeeks)
+      if (entry.isIntersecting && !(entry.target.classList.contains("past") && !table.classList.contains("show_past"))) {
+        getWeekBody(entry.target.id.slice("week_".length));
+        observer.unobserve(entry.target);
+      }
+    }
+  }, {rootMargin: "500px 0px"});
+  data.weeks.forEach((week, weekNum) => observer.observe(document.getElementById("week_" + weekNum)));
+  return teamIndex;
+}
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+import argparse
+import functools
+import json
+import sys
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from generator import TEAM_PLAYS, TEAM_REFS, find_csv_files, index_sort_key, read_schedule
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+
+# Number of rendered responses to keep (the same handful of queries tend to be repeated all weekend)
+DEFAULT_CACHE_SIZE = 1024
+
+# Can be used instead of a season name to get the most recent season
+CURRENT_SEASON = 'current'
+
+
+class QueryError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class SeasonIndex:
+    # Everything in a season that the queries need, built in a single pass over the parsed schedule. Each
+    # game (or open play/skills clinic slot) is stored once and the indexes hold positions in that list
+    def __init__(self, sked):
+        self.name = sked.get_page_filename()[:-len('.html')]
+        self.title = sked.get_index_title()
+        self.teams = sked.get_all_teams()
+        self.courts = sked.court_titles
+        self.weeks = []
+        self.games = []
+        self.by_team = {team: [] for team in self.teams}
+        self.by_week = []
+        self.by_court = {court: [] for court in self.courts}
+        self.by_slot = {}
+        self.byes_by_team = {team: [] for team in self.teams}
+        week_dates = sked.get_week_dates()
+        for week_num, week_title in enumerate(sked.week_titles, start=1):
+            week_sked = sked.weekly_skeds[week_title]
+            week_date = week_dates[week_title]
+            week = {
+                'week': week_num,
+                'title': week_title,
+                'date': week_date.isoformat() if week_date else None,
+                'tba': week_sked.is_tba,
+                'byes': week_sked.bye_week_teams,
+            }
+            self.weeks.append(week)
+            week_games = []
+            for time_slot in week_sked.time_slots:
+                slot_games = []
+                for court, game in week_sked.time_slot_skeds[time_slot].time_slot_games.items():
+                    record = {'week': week_num, 'date': week['date'], 'time': time_slot, 'court': court}
+                    if game.is_skills_clinic:
+                        record['skills_clinic'] = game.skills_clinic_title
+                    elif game.is_open_play:
+                        record['open_play'] = game.open_play_title
+                    else:
+                        record.update(team_1=game.team_1, team_2=game.team_2, ref=game.ref_team)
+                    game_id = len(self.games)
+                    self.games.append(record)
+                    week_games.append(game_id)
+                    slot_games.append(game_id)
+                    self.by_court[court].append(game_id)
+                    for team in (game.team_1, game.team_2, game.ref_team):
+                        if team in self.by_team:
+                            self.by_team[team].append(game_id)
+                self.by_slot[(week_num, time_slot)] = slot_games
+            self.by_week.append(week_games)
+            for team in week_sked.bye_week_teams:
+                if team in self.byes_by_team:
+                    self.byes_by_team[team].append(week_num)
+
+    def get_week_num(self, week):
+        # Weeks are numbered from 1 in the order they appear in the schedule (including playoff weeks)
+        try:
+            week_num = int(week)
+        except ValueError:
+            raise QueryError(HTTPStatus.BAD_REQUEST, f'week must be a number, not {week!r}')
+        if not 1 <= week_num <= len(self.weeks):
+            raise QueryError(HTTPStatus.NOT_FOUND, f'{self.name} has no week {week_num} (it has {len(self.weeks)})')
+        return week_num
+
+    def get_team(self, team):
+        team = team.upper()
+        if team not in self.by_team:
+            raise QueryError(HTTPStatus.NOT_FOUND, f'{team} is not a team in {self.name}')
+        return team
+
+    def get_court(self, court):
+        # Courts can be given by their full name ('Court 2') or just the number ('2')
+        for court_title in self.courts:
+            if court.lower() in (court_title.lower(), court_title.lower().replace('court', '').strip()):
+                return court_title
+        raise QueryError(HTTPStatus.NOT_FOUND, f'{court} is not a court in {self.name}')
+
+    def team_schedule(self, team, week=None):
+        team = self.get_team(team)
+        week_num = self.get_week_num(week) if week else None
+        games = []
+        for game_id in self.by_team[team]:
+            record = self.games[game_id]
+            if week_num is None or record['week'] == week_num:
+                role = TEAM_PLAYS if team in (record['team_1'], record['team_2']) else TEAM_REFS
+                games.append(dict(record, role=role))
+        byes = [self.weeks[num - 1]['title'] for num in self.byes_by_team[team] if week_num is None or num == week_num]
+        return {'season': self.name, 'team': team, 'games': games, 'byes': byes}
+
+    def head_to_head(self, teams):
+        if len(teams) != 2:
+            raise QueryError(HTTPStatus.BAD_REQUEST, 'head-to-head needs exactly two teams, e.g. ?teams=INT5,INT7')
+        team_1, team_2 = self.get_team(teams[0]), self.get_team(teams[1])
+        # Only the games of one of the teams need to be checked
+        games = [self.games[game_id] for game_id in self.by_team[team_1]
+                 if {self.games[game_id]['team_1'], self.games[game_id]['team_2']} == {team_1, team_2}]
+        return {'season': self.name, 'teams': [team_1, team_2], 'games': games}
+
+    def court_usage(self, court, week=None):
+        court = self.get_court(court)
+        if week:
+            week_num = self.get_week_num(week)
+            game_ids = [game_id for game_id in self.by_week[week_num - 1] if self.games[game_id]['court'] == court]
+        else:
+            game_ids = self.by_court[court]
+        games = [self.games[game_id] for game_id in game_ids]
+        return {
+            'season': self.name,
+            'court': court,
+            'games': games,
+            'open_play': sum(1 for record in games if 'open_play' in record),
+            'skills_clinic': sum(1 for record in games if 'skills_clinic' in record),
+        }
+
+    def byes(self, week=None):
+        weeks = [self.weeks[self.get_week_num(week) - 1]] if week else self.weeks
+        return {'season': self.name, 'weeks': [{key: w[key] for key in ('week', 'title', 'date', 'byes')} for w in weeks]}
+
+    def week_schedule(self, week, time_slot=None):
+        week_num = self.get_week_num(week)
+        if time_slot:
+            if (week_num, time_slot) not in self.by_slot:
+                raise QueryError(HTTPStatus.NOT_FOUND, f'week {week_num} of {self.name} has no {time_slot} time slot')
+            game_ids = self.by_slot[(week_num, time_slot)]
+        else:
+            game_ids = self.by_week[week_num - 1]
+        return dict(self.weeks[week_num - 1], season=self.name, games=[self.games[game_id] for game_id in game_ids])
+
+
+class ScheduleService:
+    # Answers queries from the season indexes. The encoded responses are kept in an LRU cache, keyed on the
+    # path and the (sorted) query parameters, so repeated queries don't have to be rebuilt each time
+    def __init__(self, seasons, cache_size=DEFAULT_CACHE_SIZE):
+        self.seasons = {season.name: season for season in seasons}
+        self.current_season = max(self.seasons, key=lambda name: index_sort_key(name + '.html')) if seasons else None
+        self.get_response = functools.lru_cache(maxsize=cache_size)(self.render_response)
+
+    def get_season(self, name):
+        if name == CURRENT_SEASON and self.current_season:
+            name = self.current_season
+        if name not in self.seasons:
+            raise QueryError(HTTPStatus.NOT_FOUND, f'no season called {name!r} (try /seasons)')
+        return self.seasons[name]
+
+    def query(self, path, params):
+        # Routes a query (path split into its parts and a dict of the query parameters) to the season index
+        parts = [unquote(part) for part in path.strip('/').split('/') if part]
+        if parts == ['seasons']:
+            return [{'season': s.name, 'title': s.title, 'teams': s.teams, 'courts': s.courts, 'weeks': len(s.weeks)}
+                    for s in sorted(self.seasons.values(), key=lambda s: index_sort_key(s.name + '.html'))]
+        if parts == ['stats']:
+            return {'cache': self.get_response.cache_info()._asdict()}
+        if len(parts) < 3 or parts[0] != 'seasons':
+            raise QueryError(HTTPStatus.NOT_FOUND, f'unknown query {path!r}')
+        season = self.get_season(parts[1])
+        query_type, args = parts[2], parts[3:]
+        if query_type == 'teams' and len(args) == 1:
+            return season.team_schedule(args[0], params.get('week'))
+        if query_type == 'head-to-head' and not args:
+            return season.head_to_head(params.get('teams', '').split(','))
+        if query_type == 'courts' and len(args) == 1:
+            return season.court_usage(args[0], params.get('week'))
+        if query_type == 'byes' and not args:
+            return season.byes(params.get('week'))
+        if query_type == 'weeks' and len(args) == 1:
+            return season.week_schedule(args[0], params.get('time'))
+        raise QueryError(HTTPStatus.NOT_FOUND, f'unknown query {path!r}')
+
+    def render_response(self, path, params):
+        # Returns (status, json bytes) for a query. params is a sorted tuple of (name, value) pairs so it can be
+        # used as part of the cache key
+        try:
+            status, body = HTTPStatus.OK, self.query(path, dict(params))
+        except QueryError as e:
+            status, body = e.status, {'error': e.message}
+        return status, json.dumps(body, separators=(',', ':')).encode()
+
+
+class ScheduleRequestHandler(BaseHTTPRequestHandler):
+    service = None  # set by make_server
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path.rstrip('/') == '/stats':
+            # Don't cache the cache stats
+            status, body = self.service.render_response(url.path, ())
+        else:
+            status, body = self.service.get_response(url.path, tuple(sorted(parse_qsl(url.query))))
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Logging every request slows things down a lot when the same queries are made thousands of times
+        pass
+
+
+def load_seasons(paths):
+    # Parses every csv (or every csv in a folder) once at startup
+    return [SeasonIndex(read_schedule(csv_filename)) for csv_filename in find_csv_files(paths)]
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    handler = type('BoundScheduleRequestHandler', (ScheduleRequestHandler,), {'service': service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve json queries about the schedules on a local web server')
+    parser.add_argument('paths', nargs='+', help='csv file(s) or folder(s) of csv files to serve')
+    parser.add_argument('--host', help='address to listen on', default=DEFAULT_HOST)
+    parser.add_argument('-p', '--port', help='port to listen on', default=DEFAULT_PORT, type=int)
+    parser.add_argument('--cache-size', help='number of responses to keep in the cache', default=DEFAULT_CACHE_SIZE, type=int)
+    args = parser.parse_args()
+
+    service = ScheduleService(load_seasons(args.paths), args.cache_size)
+    server = make_server(service, args.host, args.port)
+    print(f'Serving {len(service.seasons)} season(s) on http://{args.host}:{server.server_port}/seasons (press Ctrl+C to stop)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+import csv
+import os
+import sys
+
+import pytest
+
+# The scripts import each other as top level modules (e.g. "from generator import Schedule")
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS_DIR)
+
+SAMPLE_CSVS_DIR = os.path.join(SCRIPTS_DIR, 'sample_csvs')
+
+
+@pytest.fixture
+def sample_csv():
+    # Path of a csv in the sample_csvs folder
+    return lambda csv_filename: os.path.join(SAMPLE_CSVS_DIR, csv_filename)
+
+
+@pytest.fixture
+def edited_csv(tmp_path):
+    # Copy of a sample csv with some cells changed, given as {(row number, column number): value}
+    def edit(csv_filename, changes, output_name='edited.csv'):
+        with open(os.path.join(SAMPLE_CSVS_DIR, csv_filename), newline='') as csvfile:
+            rows = list(csv.reader(csvfile))
+        for (row_num, col_num), value in changes.items():
+            rows[row_num][col_num] = value
+        output_filename = tmp_path / output_name
+        with open(output_filename, 'w', newline='') as csvfile:
+            csv.writer(csvfile, lineterminator='\n').writerows(rows)
+        return str(output_filename)
+    return edit
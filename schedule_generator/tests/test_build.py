@@ -0,0 +1,118 @@
+import os
+import shutil
+
+import pytest
+
+import generator
+
+FALL_2024 = 'Fall 2024 Season Schedule.csv'
+
+
+@pytest.fixture
+def assets_dir(tmp_path, monkeypatch):
+    # Copy of the templates, styles and scripts the builds read, so a test can change them
+    copy_dir = tmp_path / 'assets_copy'
+    copy_dir.mkdir()
+    for asset_filename in generator.ASSET_FILENAMES:
+        shutil.copy(os.path.join(generator.ASSETS_DIR, asset_filename), copy_dir)
+    monkeypatch.setattr(generator, 'ASSETS_DIR', str(copy_dir))
+    generator.load_assets.cache_clear()
+    generator.get_assets_hash.cache_clear()
+    yield copy_dir
+    generator.load_assets.cache_clear()
+    generator.get_assets_hash.cache_clear()
+
+
+@pytest.fixture
+def csv_dir(tmp_path, sample_csv):
+    csv_dir = tmp_path / 'csvs'
+    csv_dir.mkdir()
+    shutil.copy(sample_csv(FALL_2024), csv_dir)
+    return csv_dir
+
+
+def build(csv_dir, output_dir, capsys):
+    generator.build_all_seasons(str(csv_dir), str(output_dir))
+    return capsys.readouterr().out
+
+
+def test_unchanged_csv_is_skipped(tmp_path, assets_dir, csv_dir, capsys):
+    output_dir = tmp_path / 'site'
+    assert '-> fall-2024.html' in build(csv_dir, output_dir, capsys)
+    page_mtime = os.stat(output_dir / 'fall-2024.html').st_mtime_ns
+    assert 'unchanged, skipping' in build(csv_dir, output_dir, capsys)
+    assert os.stat(output_dir / 'fall-2024.html').st_mtime_ns == page_mtime
+
+
+def test_changed_csv_is_rebuilt(tmp_path, assets_dir, csv_dir, capsys):
+    output_dir = tmp_path / 'site'
+    build(csv_dir, output_dir, capsys)
+    csv_filename = csv_dir / FALL_2024
+    csv_filename.write_text(csv_filename.read_text().replace('ref: INT11', 'ref: INT10', 1))
+    assert '-> fall-2024.html' in build(csv_dir, output_dir, capsys)
+
+
+def test_changed_template_forces_rebuild(tmp_path, assets_dir, csv_dir, capsys):
+    output_dir = tmp_path / 'site'
+    build(csv_dir, output_dir, capsys)
+    template_filename = assets_dir / 'page_template.html'
+    template_filename.write_text(template_filename.read_text().replace('<body>', '<body>\n<!-- changed -->', 1))
+    generator.load_assets.cache_clear()
+    generator.get_assets_hash.cache_clear()
+    assert '-> fall-2024.html' in build(csv_dir, output_dir, capsys)
+    assert '<!-- changed -->' in (output_dir / 'fall-2024.html').read_text()
+
+
+def test_missing_output_is_rebuilt(tmp_path, assets_dir, csv_dir, capsys):
+    output_dir = tmp_path / 'site'
+    build(csv_dir, output_dir, capsys)
+    os.remove(output_dir / 'fall-2024.html')
+    assert '-> fall-2024.html' in build(csv_dir, output_dir, capsys)
+    assert (output_dir / 'fall-2024.html').exists()
+
+
+def test_single_season_is_skipped(tmp_path, monkeypatch, assets_dir, sample_csv, capsys):
+    monkeypatch.chdir(tmp_path)
+    generator.build_single_season(sample_csv(FALL_2024))
+    assert (tmp_path / 'generated_schedule.html').exists()
+    capsys.readouterr()
+    generator.build_single_season(sample_csv(FALL_2024))
+    assert 'is up to date' in capsys.readouterr().out
+
+
+def test_write_file_atomic(tmp_path):
+    filename = tmp_path / 'page.html'
+    filename.write_text('old')
+    generator.write_file_atomic(str(filename), 'new')
+    assert filename.read_text() == 'new'
+    # Same permissions as a file written with open(), and no temp files left behind
+    assert os.stat(filename).st_mode & 0o777 == 0o666 & ~generator.get_umask()
+    assert os.listdir(tmp_path) == ['page.html']
+
+
+def test_write_file_atomic_failure(tmp_path, monkeypatch):
+    # If the rename fails the old file is left as it was and the temp file is cleaned up
+    filename = tmp_path / 'page.html'
+    filename.write_text('old')
+
+    def fail_replace(src, dst):
+        raise OSError('rename failed')
+    monkeypatch.setattr(os, 'replace', fail_replace)
+    with pytest.raises(OSError):
+        generator.write_file_atomic(str(filename), 'new')
+    assert filename.read_text() == 'old'
+    assert os.listdir(tmp_path) == ['page.html']
+
+
+def test_batch_start_col(tmp_path, assets_dir, sample_csv, capsys):
+    # The start column is passed on to every season in batch mode (fall 2022 has an empty first column)
+    csv_dir = tmp_path / 'csvs'
+    csv_dir.mkdir()
+    shutil.copy(sample_csv('Live Postings - Fall 2022 Season Schedule.csv'), csv_dir)
+    detected_dir, given_dir = tmp_path / 'detected', tmp_path / 'given'
+    build(csv_dir, detected_dir, capsys)
+    generator.build_all_seasons(str(csv_dir), str(given_dir), start_col=1)
+    assert (given_dir / 'fall-2022.html').read_text() == (detected_dir / 'fall-2022.html').read_text()
+    # It's one of the options that rebuilds a season when changed
+    manifest = generator.load_manifest(str(given_dir))
+    assert [entry['options']['start_col'] for entry in manifest['seasons'].values()] == [1]
@@ -0,0 +1,53 @@
+import diff
+from generator import read_schedule, render_season, write_output
+
+FALL_2024 = 'Fall 2024 Season Schedule.csv'
+
+# A new ref for a week 1 game and a new opponent for a week 3 game
+CHANGES = {(3, 3): 'ref: INT10', (20, 2): 'INT1 v INT12'}
+
+
+def read_page(page_filename):
+    with open(page_filename, 'r') as page_file:
+        return page_file.read()
+
+
+def test_changelog(sample_csv, edited_csv):
+    old_sked = read_schedule(sample_csv(FALL_2024))
+    new_sked = read_schedule(edited_csv(FALL_2024, CHANGES))
+    changelog = diff.diff_schedules(old_sked, new_sked)
+    assert sorted(changelog['changed_weeks']) == ['Week 1:  Sep 8', 'Week 3: Sep 29']
+    assert sorted(change['type'] for change in changelog['changes']) == ['game_added', 'game_removed', 'ref_changed']
+
+
+def test_diff_without_changes(sample_csv):
+    changelog = diff.diff_schedules(read_schedule(sample_csv(FALL_2024)), read_schedule(sample_csv(FALL_2024)))
+    assert not changelog['changes']
+    assert not changelog['changed_weeks']
+
+
+def test_patched_page_matches_fresh_build(tmp_path, sample_csv, edited_csv):
+    new_csv = edited_csv(FALL_2024, CHANGES)
+    page_filename = str(tmp_path / 'fall-2024.html')
+    write_output(page_filename, render_season(read_schedule(sample_csv(FALL_2024)), False))
+
+    old_sked, new_sked = read_schedule(sample_csv(FALL_2024)), read_schedule(new_csv)
+    changelog = diff.diff_schedules(old_sked, new_sked)
+    assert diff.update_page(page_filename, old_sked, new_sked, changelog)
+    patched_html = read_page(page_filename)
+    # Same as building the new schedule with the changes highlighted, and without the highlights same as a
+    # plain build of the new csv
+    assert patched_html == render_season(new_sked, False)
+    assert ' updated"' in patched_html
+    assert patched_html.replace(' updated"', '"') == render_season(read_schedule(new_csv), False)
+
+
+def test_compact_page_is_rebuilt(tmp_path, sample_csv, edited_csv):
+    # Compact pages can't be patched, so they're built again (still compact) with the changes highlighted
+    page_filename = str(tmp_path / 'fall-2024.html')
+    write_output(page_filename, render_season(read_schedule(sample_csv(FALL_2024)), True))
+
+    old_sked, new_sked = read_schedule(sample_csv(FALL_2024)), read_schedule(edited_csv(FALL_2024, CHANGES))
+    changelog = diff.diff_schedules(old_sked, new_sked)
+    assert not diff.update_page(page_filename, old_sked, new_sked, changelog)
+    assert read_page(page_filename) == render_season(new_sked, True)
@@ -0,0 +1,75 @@
+import csv
+import sys
+
+import pytest
+
+import ref_solver
+from generator import read_schedule
+from validator import SEVERITY_ERROR, SEVERITY_WARNING, validate_schedule
+
+# Seasons whose refs and byes are all filled in correctly in the csv
+FULLY_REFFED = ['Fall 2024 Season Schedule.csv', 'Fall 2025 Schedule.csv', 'Live Postings - Fall 2021 Season Schedule.csv',
+                'Spring 2025 Season Schedule.csv', 'Spring 2026 Season Schedule.csv']
+
+
+def run_solver(monkeypatch, *args):
+    monkeypatch.setattr(sys, 'argv', ['ref_solver.py'] + list(args))
+    return ref_solver.main()
+
+
+@pytest.mark.parametrize('csv_filename', FULLY_REFFED)
+def test_keep_refs_round_trips(monkeypatch, tmp_path, sample_csv, csv_filename):
+    # With every ref kept there's nothing to change, so the csv is written back byte for byte
+    output_filename = tmp_path / 'refs.csv'
+    assert run_solver(monkeypatch, sample_csv(csv_filename), '-k', '-o', str(output_filename)) == ref_solver.EXIT_OK
+    with open(sample_csv(csv_filename), 'rb') as csv_file:
+        assert output_filename.read_bytes() == csv_file.read()
+
+
+@pytest.mark.parametrize('csv_filename', FULLY_REFFED)
+def test_solved_refs_are_valid_and_even(sample_csv, csv_filename):
+    sked = read_schedule(sample_csv(csv_filename))
+    spread_before = ref_solver.get_ref_spread(sked, validate_schedule(sked).stats['ref_counts'])
+    solver = ref_solver.RefSolver(sked)
+    assert solver.solve() == []
+    assert solver.fix_byes() == []
+    result = validate_schedule(sked)
+    assert result.count(SEVERITY_ERROR) == 0
+    assert result.count(SEVERITY_WARNING) == 0
+    # The refs are spread at least as evenly as they were by hand
+    spread_after = ref_solver.get_ref_spread(sked, solver.get_ref_counts())
+    assert ref_solver.get_wider_spreads(spread_before, spread_after) == []
+
+
+def test_empty_refs_are_filled_in(monkeypatch, tmp_path, edited_csv):
+    # Only the cleared ref is picked when keeping the others
+    csv_filename = edited_csv('Fall 2024 Season Schedule.csv', {(3, 3): ''})
+    output_filename = tmp_path / 'refs.csv'
+    assert run_solver(monkeypatch, csv_filename, '-k', '-o', str(output_filename)) == ref_solver.EXIT_OK
+    sked = read_schedule(str(output_filename))
+    week_sked = sked.weekly_skeds[sked.week_titles[0]]
+    game = week_sked.time_slot_skeds['3:30 PM'].time_slot_games['Court 1']
+    assert game.ref_team.startswith('INT')
+    assert validate_schedule(sked).count(SEVERITY_ERROR) == 0
+
+
+def test_sheet_without_bye_column(monkeypatch, tmp_path, sample_csv, edited_csv):
+    # Without a BYE header there's no bye column, so nothing but the refs may be written (and with -k the
+    # refs don't change either)
+    with open(sample_csv('Fall 2024 Season Schedule.csv'), newline='') as csvfile:
+        rows = list(csv.reader(csvfile))
+    no_byes = {(row_num, col_num): '' for row_num, row in enumerate(rows) for col_num, cell in enumerate(row) if cell == 'BYE'}
+    assert no_byes
+    csv_filename = edited_csv('Fall 2024 Season Schedule.csv', no_byes)
+    output_filename = tmp_path / 'refs.csv'
+    assert run_solver(monkeypatch, csv_filename, '-k', '-o', str(output_filename)) == ref_solver.EXIT_OK
+    with open(csv_filename, newline='') as csvfile:
+        input_rows = list(csv.reader(csvfile))
+    with open(output_filename, newline='') as csvfile:
+        output_rows = list(csv.reader(csvfile))
+    assert output_rows == input_rows
+
+
+def test_set_cell_rejects_negative_columns():
+    with pytest.raises(ValueError):
+        ref_solver.set_cell(['a', 'b'], -1, 'c')
@@ -0,0 +1,62 @@
+import csv
+import sys
+
+import validator
+from generator import Schedule
+
+FALL_2024 = 'Fall 2024 Season Schedule.csv'
+
+
+def run_validator(monkeypatch, *args):
+    monkeypatch.setattr(sys, 'argv', ['validator.py'] + list(args))
+    return validator.main()
+
+
+def validate_csv(csv_filename):
+    sked = Schedule()
+    with open(csv_filename, newline='') as csvfile:
+        sked.parse_rows(csv.reader(csvfile))
+    return validator.validate_schedule(sked)
+
+
+def test_clean_schedule_passes(monkeypatch, sample_csv):
+    assert run_validator(monkeypatch, sample_csv(FALL_2024)) == validator.EXIT_OK
+
+
+def test_conflict_fails(monkeypatch, edited_csv):
+    # INT1 refs its own game in week 1 at 3:30
+    csv_filename = edited_csv(FALL_2024, {(3, 3): 'ref: INT1'})
+    conflicts = [issue for issue in validate_csv(csv_filename).issues if issue['check'] == 'conflict']
+    assert [(issue['team'], issue['time_slot']) for issue in conflicts] == [('INT1', '3:30 PM')]
+    assert run_validator(monkeypatch, csv_filename) == validator.EXIT_ISSUES_FOUND
+
+
+def test_missing_bye_fails(monkeypatch, edited_csv):
+    # REC9 has a bye in week 1 but isn't listed
+    csv_filename = edited_csv(FALL_2024, {(3, 18): ''})
+    byes = [issue for issue in validate_csv(csv_filename).issues if issue['check'] == 'byes']
+    assert [(issue['missing_teams'], issue['extra_teams']) for issue in byes] == [(['REC9'], [])]
+    assert run_validator(monkeypatch, csv_filename) == validator.EXIT_ISSUES_FOUND
+
+
+def test_ref_only_warning(edited_csv):
+    # REC9 (on a bye in week 1) is brought in just to ref
+    csv_filename = edited_csv(FALL_2024, {(6, 3): 'ref: REC9', (3, 18): ''})
+    issues = validate_csv(csv_filename).issues
+    assert [issue['teams'] for issue in issues if issue['check'] == 'ref_only'] == [['REC9']]
+    assert not [issue for issue in issues if issue['check'] == 'byes']
+
+
+def test_counts_past_a_byte(sample_csv):
+    # Far more games in one time slot than a byte can count still comes out as a conflict
+    sked = Schedule()
+    with open(sample_csv(FALL_2024), newline='') as csvfile:
+        sked.parse_rows(csv.reader(csvfile))
+    week_sked = sked.weekly_skeds[sked.week_titles[0]]
+    time_slot_games = week_sked.time_slot_skeds[week_sked.time_slots[0]].time_slot_games
+    for court_num in range(300):
+        game = Schedule.SingleGameInfo()
+        game.team_1, game.team_2, game.ref_team = 'REC1', 'REC2', 'REC1'
+        time_slot_games['Extra court ' + str(court_num)] = game
+    conflicts = [issue for issue in validator.validate_schedule(sked).issues if issue['check'] == 'conflict']
+    assert sorted(issue['team'] for issue in conflicts) == ['REC1', 'REC2']
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import operator
+import sys
+
+from generator import read_schedule
+
+SEVERITY_ERROR = 'error'
+SEVERITY_WARNING = 'warning'
+SEVERITY_INFO = 'info'
+
+# Exit codes for the command line
+EXIT_OK = 0
+EXIT_ISSUES_FOUND = 1
+
+# Default for how far a team's ref count can be from its division's average before we warn about it
+DEFAULT_REF_TOLERANCE = 2
+
+# Occupancy counts are kept in bytes, so they stop going up at 127 (anything over 1 is a conflict anyway), which
+# also keeps playing + reffing within a byte
+MAX_COUNT = 127
+
+# Lookup tables for bytes.translate, which swaps every byte of a count array for table[count]. Each one has an
+# entry for every possible count (0-255) and turns the counts into a 0/1 mask: 1 for counts over 1, 1 for
+# counts of 1 or more, and 1 for counts of 0
+MORE_THAN_ONE = bytes([0, 0] + [1] * 254)
+AT_LEAST_ONE = bytes([0] + [1] * 255)
+ZERO = bytes([1] + [0] * 255)
+
+
+class ValidationResult:
+    def __init__(self, title):
+        self.title = title
+        self.issues = []
+        self.stats = {}
+
+    def add_issue(self, check, severity, message, **details):
+        issue = {'check': check, 'severity': severity, 'message': message}
+        issue.update(details)
+        self.issues.append(issue)
+
+    def count(self, severity):
+        return sum(1 for issue in self.issues if issue['severity'] == severity)
+
+    def to_dict(self):
+        return {
+            'title': self.title,
+            'errors': self.count(SEVERITY_ERROR),
+            'warnings': self.count(SEVERITY_WARNING),
+            'issues': self.issues,
+            'stats': self.stats,
+        }
+
+
+class OccupancyMatrix:
+    # Counts of how many times each team is on a court (playing or reffing) in every time slot of every
+    # week. The counts are stored as flat team x week x time slot byte arrays so the checks can work on
+    # whole arrays at a time instead of rebuilding sets of teams for every week and time slot
+    def __init__(self, sked):
+        self.weeks = [week for week in sked.week_titles if sked.weekly_skeds[week].time_slots]
+        self.num_weeks = len(self.weeks)
+        self.num_slots = max((len(sked.weekly_skeds[week].time_slots) for week in self.weeks), default=0)
+        games = list(self.iter_games(sked))
+
+        # Teams in each division come first, followed by any other names that show up in the schedule
+        # (e.g. a typo in a ref or bye cell) so those can be reported too
+        self.teams = sked.get_all_teams()
+        self.num_known_teams = len(self.teams)
+        self.team_ids = {team: team_id for team_id, team in enumerate(self.teams)}
+        other_names = [team for _, _, game in games for team in (game.team_1, game.team_2, game.ref_team)]
+        other_names += [team for week in self.weeks for team in sked.weekly_skeds[week].bye_week_teams]
+        for team in other_names:
+            if team and team not in self.team_ids:
+                self.team_ids[team] = len(self.teams)
+                self.teams.append(team)
+
+        size = len(self.teams) * self.num_weeks * self.num_slots
+        self.playing = bytearray(size)
+        self.reffing = bytearray(size)
+        for week_num, slot_num, game in games:
+            self.add(self.playing, self.cell(self.team_ids[game.team_1], week_num, slot_num))
+            self.add(self.playing, self.cell(self.team_ids[game.team_2], week_num, slot_num))
+            if game.ref_team:
+                self.add(self.reffing, self.cell(self.team_ids[game.ref_team], week_num, slot_num))
+        # Total number of times each team is on a court in each time slot
+        self.occupied = bytes(map(operator.add, self.playing, self.reffing))
+
+    @staticmethod
+    def add(counts, cell):
+        if counts[cell] < MAX_COUNT:
+            counts[cell] += 1
+
+    def iter_games(self, sked):
+        for week_num, week in enumerate(self.weeks):
+            week_sked = sked.weekly_skeds[week]
+            for slot_num, time_slot in enumerate(week_sked.time_slots):
+                for game in week_sked.time_slot_skeds[time_slot].time_slot_games.values():
+                    if not (game.is_skills_clinic or game.is_open_play):
+                        yield week_num, slot_num, game
+
+    def cell(self, team_id, week_num, slot_num):
+        return (team_id * self.num_weeks + week_num) * self.num_slots + slot_num
+
+    def split_cell(self, idx):
+        team_week, slot_num = divmod(idx, self.num_slots)
+        team_id, week_num = divmod(team_week, self.num_weeks)
+        return team_id, week_num, slot_num
+
+    def week_slice(self, team_id, week_num):
+        start = self.cell(team_id, week_num, 0)
+        return slice(start, start + self.num_slots)
+
+    def team_slice(self, team_id):
+        start = self.cell(team_id, 0, 0)
+        return slice(start, start + self.num_weeks * self.num_slots)
+
+    def team_weeks(self, mask):
+        # Collapses a team x week x time slot 0/1 mask to team x week (1 if it's 1 in any time slot of the week)
+        return any_in_groups(mask, len(self.teams) * self.num_weeks)
+
+    def week_teams(self, team_week_mask, week_num, num_teams=None):
+        # The part of a team x week mask for one week, one value per team
+        end = (num_teams if num_teams is not None else len(self.teams)) * self.num_weeks
+        return team_week_mask[week_num:end:self.num_weeks]
+
+
+def any_in_groups(mask, num_groups):
+    # Splits a 0/1 mask into num_groups runs of the same length and gives back one value per run, 1 if any
+    # value in the run is 1
+    group_size = len(mask) // num_groups if num_groups else 0
+    if not group_size:
+        return bytes(num_groups)
+    collapsed = bytearray(num_groups)
+    for group_num in range(num_groups):
+        start = group_num * group_size
+        if any(mask[start:start + group_size]):
+            collapsed[group_num] = 1
+    return bytes(collapsed)
+
+
+def mask_and_not(mask, other_mask):
+    # 1 where mask is 1 and other_mask is 0
+    return bytes(int(value and not other_value) for value, other_value in zip(mask, other_mask))
+
+
+def find_all(mask):
+    # Positions of every 1 in a 0/1 mask
+    positions = []
+    idx = mask.find(1)
+    while idx != -1:
+        positions.append(idx)
+        idx = mask.find(1, idx + 1)
+    return positions
+
+
+def check_conflicts(sked, matrix, result):
+    # A team can only be in one place (playing or reffing) in each time slot
+    for idx in find_all(matrix.occupied.translate(MORE_THAN_ONE)):
+        team_id, week_num, slot_num = matrix.split_cell(idx)
+        week = matrix.weeks[week_num]
+        time_slot = sked.weekly_skeds[week].time_slots[slot_num]
+        team = matrix.teams[team_id]
+        result.add_issue('conflict', SEVERITY_ERROR,
+                         f'CONFLICT DETECTED: {team} is on more than one court in {week} at {time_slot}',
+                         week=week, time_slot=time_slot, team=team)
+
+
+def check_byes(sked, matrix, result):
+    # Teams that aren't on a court at all in a week should be the ones listed as having a bye
+    idle = matrix.team_weeks(matrix.occupied.translate(AT_LEAST_ONE)).translate(ZERO)
+    for week_num, week in enumerate(matrix.weeks):
+        listed_byes = set(sked.weekly_skeds[week].bye_week_teams)
+        week_idle = matrix.week_teams(idle, week_num, matrix.num_known_teams)
+        calculated_byes = {matrix.teams[team_id] for team_id in find_all(week_idle)}
+        if calculated_byes != listed_byes:
+            missing_byes = sorted(calculated_byes - listed_byes)
+            extra_byes = sorted(listed_byes - calculated_byes)
+            result.add_issue('byes', SEVERITY_ERROR,
+                             f'INVALID BYE WEEK TEAMS DETECTED in {week}! Extra teams: {extra_byes} | Missing teams: {missing_byes}',
+                             week=week, extra_teams=extra_byes, missing_teams=missing_byes)
+
+
+def check_ref_only(sked, matrix, result):
+    # Teams shouldn't have to show up just to ref
+    reffing = matrix.team_weeks(matrix.reffing.translate(AT_LEAST_ONE))
+    playing = matrix.team_weeks(matrix.playing.translate(AT_LEAST_ONE))
+    ref_only = mask_and_not(reffing, playing)
+    for week_num, week in enumerate(matrix.weeks):
+        ref_only_teams = [matrix.teams[team_id] for team_id in find_all(matrix.week_teams(ref_only, week_num))]
+        if ref_only_teams:
+            result.add_issue('ref_only', SEVERITY_WARNING,
+                             f'FOUND TEAMS ONLY REFFING in {week}: {ref_only_teams}',
+                             week=week, teams=ref_only_teams)
+
+
+def check_ref_load(sked, matrix, result, ref_tolerance):
+    # Refs should be spread evenly between the teams of each division
+    ref_counts = {}
+    for team_id in range(matrix.num_known_teams):
+        ref_counts[matrix.teams[team_id]] = sum(matrix.reffing[matrix.team_slice(team_id)])
+    result.stats['ref_counts'] = ref_counts
+    for division in sked.get_team_counts():
+        division_counts = {team: count for team, count in ref_counts.items()
+                           if team.startswith(division) and team[len(division):].isdigit()}
+        if not division_counts:
+            continue
+        average = sum(division_counts.values()) / len(division_counts)
+        for team, count in division_counts.items():
+            if abs(count - average) > ref_tolerance:
+                result.add_issue('ref_load', SEVERITY_WARNING,
+                                 f'{team} refs {count} times but the {division} average is {average:.1f}',
+                                 team=team, ref_count=count, division_average=round(average, 2))
+
+
+def check_back_to_back(sked, matrix, result):
+    # Playing in two time slots in a row is allowed (double headers) but worth knowing about
+    playing_mask = matrix.playing.translate(AT_LEAST_ONE)
+    # Line each time slot up with the next one, so a 1 in both means back to back games
+    back_to_back = bytes(map(operator.and_, playing_mask, playing_mask[1:]))
+    for idx in find_all(back_to_back):
+        team_id, week_num, slot_num = matrix.split_cell(idx)
+        if slot_num == matrix.num_slots - 1:
+            continue  # the next cell belongs to the following week
+        week = matrix.weeks[week_num]
+        time_slots = sked.weekly_skeds[week].time_slots
+        team = matrix.teams[team_id]
+        result.add_issue('back_to_back', SEVERITY_INFO,
+                         f'{team} plays back to back games in {week} at {time_slots[slot_num]} and {time_slots[slot_num + 1]}',
+                         week=week, time_slot=time_slots[slot_num], team=team)
+
+
+def check_teams(sked, matrix, result):
+    # Names that aren't part of any division are usually typos in the sheet
+    for team_id in range(matrix.num_known_teams, len(matrix.teams)):
+        team = matrix.teams[team_id]
+        result.add_issue('unknown_team', SEVERITY_WARNING, f'{team} is not a team in any division', team=team)
+    # Team counts come from the highest team number seen, so check every team actually plays
+    playing = any_in_groups(matrix.team_weeks(matrix.playing.translate(AT_LEAST_ONE)), len(matrix.teams))
+    for team_id in find_all(playing[:matrix.num_known_teams].translate(ZERO)):
+        team = matrix.teams[team_id]
+        result.add_issue('no_games', SEVERITY_WARNING, f'{team} does not play any games', team=team)
+
+
+def validate_schedule(sked, ref_tolerance=DEFAULT_REF_TOLERANCE):
+    result = ValidationResult(sked.title)
+    matrix = OccupancyMatrix(sked)
+    check_teams(sked, matrix, result)
+    check_conflicts(sked, matrix, result)
+    check_byes(sked, matrix, result)
+    check_ref_only(sked, matrix, result)
+    check_ref_load(sked, matrix, result, ref_tolerance)
+    check_back_to_back(sked, matrix, result)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check schedule csv files for conflicts and other problems')
+    parser.add_argument('filenames', nargs='+', help='csv file(s) to check')
+    parser.add_argument('-s', '--start-col', help='first column in csv that is not blank (detected automatically if not given)', type=int)
+    parser.add_argument('-j', '--json', help='print the results as json', action='store_true')
+    parser.add_argument('--strict', help='also exit with an error code if there are warnings', action='store_true')
+    parser.add_argument('--ref-tolerance', help='how far a team\'s ref count can be from its division average',
+                        default=DEFAULT_REF_TOLERANCE, type=float)
+    args = parser.parse_args()
+
+    results = []
+    for filename in args.filenames:
+        sked = read_schedule(filename, args.start_col)
+        result = validate_schedule(sked, args.ref_tolerance)
+        results.append(result)
+        if not args.json:
+            print(f'{filename} ({result.title}): {result.count(SEVERITY_ERROR)} errors, {result.count(SEVERITY_WARNING)} warnings')
+            for issue in result.issues:
+                print('  ' + issue['severity'].upper() + ': ' + issue['message'])
+
+    if args.json:
+        print(json.dumps([result.to_dict() for result in results], indent=2))
+
+    failing_severities = [SEVERITY_ERROR, SEVERITY_WARNING] if args.strict else [SEVERITY_ERROR]
+    if any(result.count(severity) for result in results for severity in failing_severities):
+        return EXIT_ISSUES_FOUND
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())